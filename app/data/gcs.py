@@ -5,12 +5,67 @@ Google Cloud Storage interaction for the Indonesian Pronunciation App.
 import streamlit as st
 import os
 import pandas as pd
+import numpy as np
 import io
 import tempfile
 import json
+import hashlib
 from google.cloud import storage
 from google.oauth2 import service_account
 
+# Local directory for downloaded blobs, shared across sessions and restarts
+DOWNLOAD_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'natify_cache')
+# Each cached blob has a sidecar file holding its generation; the sidecar's
+# modification time records when the blob was last used
+GENERATION_SUFFIX = '.generation'
+# Maximum number of blobs kept locally; the least recently used are removed beyond it
+DOWNLOAD_CACHE_MAX_FILES = 2000
+
+# Maximum word counts for the easy and medium difficulty levels
+EASY_MAX_WORDS = 3
+MEDIUM_MAX_WORDS = 8
+
+class SharedIndex(dict):
+    """
+    Dictionary stored in DataFrame.attrs that derived DataFrames share.
+
+    pandas deep-copies attrs into every DataFrame or Series derived from
+    another one (filters, copies, row access), which for large lookup
+    indexes would copy them over and over. Deep-copying a SharedIndex
+    returns the same object instead, so every derived frame sees one index.
+    """
+
+    def __deepcopy__(self, memo):
+        return self
+
+@st.cache_resource(show_spinner=False)
+def get_gcs_client():
+    """
+    Create the Google Cloud Storage client shared by all sessions.
+
+    The client is thread-safe, so sharing it also shares its credentials
+    and HTTP connection pool. Raises if the credentials are invalid.
+
+    Returns:
+        GCS client object
+    """
+    credentials = service_account.Credentials.from_service_account_info(
+        st.secrets["gcp_service_account"]
+    )
+    return storage.Client(credentials=credentials, project=credentials.project_id)
+
+def _shared_gcs_client():
+    """
+    Get the shared GCS client without displaying messages.
+
+    Returns:
+        GCS client object or None if it cannot be created
+    """
+    try:
+        return get_gcs_client()
+    except Exception:
+        return None
+
 def initialize_gcs_client(bucket_name=None):
     """
     Initialize Google Cloud Storage client with proper authentication.
@@ -22,11 +77,8 @@ def initialize_gcs_client(bucket_name=None):
         GCS client object or None if initialization fails
     """
     try:
-        credentials = service_account.Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"]
-)
-        # Create GCS client with application default credentials
-        client = storage.Client(credentials=credentials, project=credentials.project_id)
+        # Reuse the GCS client shared across sessions
+        client = get_gcs_client()
 
         if bucket_name:
             # Try to access the bucket to validate connection
@@ -56,53 +108,282 @@ def initialize_gcs_client(bucket_name=None):
         """)
         return None
 
-@st.cache_data
-def download_blob_to_temp(bucket_name, blob_name):
+def _download_cache_key(bucket_name, blob_name):
     """
-    Download a blob from GCS to a temporary file without displaying messages.
+    Get the download cache key for a blob.
 
     Args:
         bucket_name: Name of the GCS bucket
         blob_name: Name of the blob (file) in the bucket
 
     Returns:
-        Path to the temporary file, or None if download fails
+        Hex digest identifying the blob
+    """
+    return hashlib.sha1(f"{bucket_name}/{blob_name}".encode('utf-8')).hexdigest()
+
+def _local_cache_path(bucket_name, blob_name):
+    """
+    Get a stable local path for a blob so downloads survive server restarts.
+
+    Args:
+        bucket_name: Name of the GCS bucket
+        blob_name: Name of the blob (file) in the bucket
+
+    Returns:
+        Path inside the local download cache directory
+    """
+    # Keep the original extension, defaulting to .wav
+    file_extension = os.path.splitext(blob_name)[1] or '.wav'
+    return os.path.join(DOWNLOAD_CACHE_DIR, _download_cache_key(bucket_name, blob_name) + file_extension)
+
+def _read_cached_generation(local_path):
+    """
+    Read the generation of the blob held in a cached file.
+
+    Args:
+        local_path: Path of the cached blob
+
+    Returns:
+        Generation number, or None if the blob has no valid sidecar
     """
     try:
-        if st.session_state.gcs_client is None:
-            st.session_state.gcs_client = initialize_gcs_client(bucket_name)
+        with open(local_path + GENERATION_SUFFIX, 'r', encoding='utf-8') as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
 
-        if st.session_state.gcs_client is None:
-            return None
+def _write_cached_generation(local_path, generation):
+    """
+    Atomically write the generation sidecar of a cached blob.
 
-        # Get bucket and blob
-        bucket = st.session_state.gcs_client.bucket(bucket_name)
-        blob = bucket.blob(blob_name)
+    One small file per blob, each replaced atomically, means concurrent
+    sessions never overwrite each other's entries.
 
-        # Check if the blob exists
-        if not blob.exists():
-            return None
+    Args:
+        local_path: Path of the cached blob
+        generation: Generation number of the blob
+    """
+    temp_file = tempfile.NamedTemporaryFile('w', delete=False, dir=DOWNLOAD_CACHE_DIR,
+                                            suffix='.tmp', encoding='utf-8')
+    with temp_file:
+        temp_file.write(str(generation))
+    os.replace(temp_file.name, local_path + GENERATION_SUFFIX)
+
+def _last_used(entry):
+    """Get the last-use time of a sidecar, treating vanished files as oldest."""
+    try:
+        return entry.stat().st_mtime
+    except OSError:
+        return 0.0
+
+def _prune_download_cache(max_files=DOWNLOAD_CACHE_MAX_FILES):
+    """
+    Remove the least recently used blobs once the cache holds more than max_files.
+
+    Args:
+        max_files: Number of blobs to keep
+    """
+    try:
+        sidecars = [entry for entry in os.scandir(DOWNLOAD_CACHE_DIR)
+                    if entry.name.endswith(GENERATION_SUFFIX)]
+    except OSError:
+        return
+    if len(sidecars) <= max_files:
+        return
+
+    sidecars.sort(key=_last_used)
+    for entry in sidecars[:len(sidecars) - max_files]:
+        # Remove the sidecar first so the blob is never considered cached without its file
+        for path in (entry.path, entry.path[:-len(GENERATION_SUFFIX)]):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
 
-        # Create temporary file with appropriate extension
-        file_extension = os.path.splitext(blob_name)[1]
-        if not file_extension:  # If no extension, default to .wav
-            file_extension = '.wav'
+def blob_exists(bucket_name, blob_name):
+    """
+    Check whether a blob exists without downloading it.
 
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension)
-        temp_file.close()
+    Args:
+        bucket_name: Name of the GCS bucket
+        blob_name: Name of the blob (file) in the bucket
+
+    Returns:
+        True if the blob is available locally or in the bucket
+    """
+    try:
+        # A previous download means the blob exists
+        if os.path.exists(_local_cache_path(bucket_name, blob_name)):
+            return True
+
+        client = _shared_gcs_client()
+        if client is None:
+            return False
+
+        return client.bucket(bucket_name).blob(blob_name).exists()
+    except Exception:
+        return False
+
+def list_blob_sizes(bucket_name, prefix=''):
+    """
+    List all blobs under a prefix with one paginated listing.
+
+    Args:
+        bucket_name: Name of the GCS bucket
+        prefix: Only list blobs whose names start with this prefix
 
-        # Download to the temporary file
-        blob.download_to_filename(temp_file.name)
+    Returns:
+        Dictionary mapping blob names to sizes in bytes, or None if listing fails
+    """
+    try:
+        client = _shared_gcs_client()
+        if client is None:
+            return None
 
-        return temp_file.name
+        blobs = client.list_blobs(bucket_name, prefix=prefix or None)
+        return {blob.name: blob.size for blob in blobs}
     except Exception:
         return None
 
-@st.cache_data
-def load_sentences_dataframe_from_gcs(bucket_name, tsv_path):
+def download_blob_to_temp(bucket_name, blob_name):
     """
-    Load the DataFrame containing sentences and audio filenames from Google Cloud Storage.
-    Handles file paths more robustly.
+    Download a blob from GCS to a temporary file without displaying messages.
+
+    Not wrapped in st.cache_data: DOWNLOAD_CACHE_DIR is the cache, and every
+    call checks the blob's generation against the cached file's sidecar, so a
+    changed blob is downloaded again. Raises if the download fails.
+
+    Args:
+        bucket_name: Name of the GCS bucket
+        blob_name: Name of the blob (file) in the bucket
+
+    Returns:
+        Path to the temporary file
+    """
+    client = get_gcs_client()
+
+    # Get bucket and blob
+    bucket = client.bucket(bucket_name)
+    blob = bucket.blob(blob_name)
+
+    # Fetch only the metadata (raises NotFound if the blob is missing)
+    blob.reload()
+
+    # Reuse a previous download if it holds the current generation of the blob
+    local_path = _local_cache_path(bucket_name, blob_name)
+    if _read_cached_generation(local_path) == blob.generation and os.path.exists(local_path):
+        # Mark the blob as recently used (the blob file itself keeps its
+        # modification time, which audio caches use as part of their key)
+        try:
+            os.utime(local_path + GENERATION_SUFFIX)
+        except OSError:
+            pass
+        return local_path
+
+    os.makedirs(DOWNLOAD_CACHE_DIR, exist_ok=True)
+
+    # Download to a temporary file first so a failed download never leaves
+    # a partial file at the cached location
+    temp_file = tempfile.NamedTemporaryFile(
+        delete=False, dir=DOWNLOAD_CACHE_DIR, suffix=os.path.splitext(local_path)[1]
+    )
+    temp_file.close()
+    try:
+        blob.download_to_filename(temp_file.name, if_generation_match=blob.generation)
+    except Exception:
+        os.unlink(temp_file.name)
+        raise
+    os.replace(temp_file.name, local_path)
+
+    # Record which generation is now cached, then keep the cache bounded
+    _write_cached_generation(local_path, blob.generation)
+    _prune_download_cache()
+
+    return local_path
+
+def determine_difficulties(sentences):
+    """
+    Determine the difficulty level of each sentence from its word count.
+
+    Args:
+        sentences: pandas Series of sentence text
+
+    Returns:
+        numpy array of difficulty levels
+    """
+    word_counts = sentences.astype(str).str.count(r'\S+')
+    return np.select(
+        [word_counts <= EASY_MAX_WORDS, word_counts <= MEDIUM_MAX_WORDS],
+        ["easy", "medium"],
+        default="difficult"
+    )
+
+def fix_paths(paths, tsv_dir):
+    """
+    Resolve relative audio paths against the directory of the TSV file.
+
+    Args:
+        paths: pandas Series of audio paths
+        tsv_dir: Directory of the TSV file in the bucket
+
+    Returns:
+        Series with relative paths joined to tsv_dir
+    """
+    paths = paths.astype(str)
+    if not tsv_dir:
+        return paths
+
+    # Paths that are already absolute (gs:// or /) are kept as is
+    is_absolute = paths.str.startswith(('gs://', '/'))
+    prefix = tsv_dir.rstrip('/') + '/'
+    return paths.where(is_absolute, prefix + paths)
+
+def partition_by_difficulty(df):
+    """
+    Split a sentences DataFrame into one DataFrame per difficulty level in a single pass.
+
+    Args:
+        df: DataFrame with a 'difficulty' column
+
+    Returns:
+        Dictionary mapping "easy", "medium" and "difficult" to their rows
+        (empty DataFrames for levels with no sentences)
+    """
+    groups = dict(tuple(df.groupby('difficulty', sort=False)))
+    return {level: groups.get(level, df.iloc[0:0]) for level in ("easy", "medium", "difficult")}
+
+def build_sentence_indexes(df):
+    """
+    Build lookup indexes for a sentences DataFrame and attach them to df.attrs.
+
+    'sentence_index' maps each sentence to the path of its first row and
+    'path_index' maps each path to the index labels of the rows using it.
+    If df has a 'difficulty' column, 'difficulty_index' maps each sentence
+    to the difficulty of its first row. All are SharedIndex objects, so
+    DataFrames derived from df share them.
+
+    Args:
+        df: DataFrame with 'sentence' and 'path' columns
+
+    Returns:
+        The same DataFrame, with the indexes stored in df.attrs
+    """
+    first_rows = df.drop_duplicates(subset='sentence')
+    df.attrs['sentence_index'] = SharedIndex(zip(first_rows['sentence'], first_rows['path']))
+    df.attrs['path_index'] = SharedIndex(
+        (path, list(labels)) for path, labels in df.groupby('path', sort=False).groups.items()
+    )
+    if 'difficulty' in df.columns:
+        df.attrs['difficulty_index'] = SharedIndex(zip(first_rows['sentence'], first_rows['difficulty']))
+    return df
+
+@st.cache_data(show_spinner=False, ttl=3600)
+def _load_sentences_dataframe(bucket_name, tsv_path):
+    """
+    Download and parse the sentences file, cached in memory for an hour.
+
+    Failures raise rather than return a value, so they are never cached, and
+    the expiry keeps the blob listing in attrs['gcs_index'] from going stale.
 
     Args:
         bucket_name: Name of the GCS bucket
@@ -111,86 +392,77 @@ def load_sentences_dataframe_from_gcs(bucket_name, tsv_path):
     Returns:
         DataFrame with sentences and audio information
     """
-    gcp_credentials = dict(st.secrets["gcp_service_account"])
+    # Get the shared GCS client
+    client = get_gcs_client()
 
-    try:
-        # Check if GCS client is initialized
-        if st.session_state.gcs_client is None:
-            st.session_state.gcs_client = initialize_gcs_client(bucket_name)
+    # Get bucket and blob
+    bucket = client.bucket(bucket_name)
+    blob = bucket.blob(tsv_path)
 
-        if st.session_state.gcs_client is None:
-            return None
+    # Check if the blob exists
+    if not blob.exists():
+        raise FileNotFoundError(f"TSV file not found in bucket: {tsv_path}")
 
-        # Get bucket and blob
-        bucket = st.session_state.gcs_client.bucket(bucket_name)
-        blob = bucket.blob(tsv_path)
+    # Download the file once into memory and parse it from there
+    buffer = io.BytesIO()
+    blob.download_to_file(buffer)
+    buffer.seek(0)
 
-        # Check if the blob exists
-        if not blob.exists():
-            st.error(f"TSV file not found in bucket: {tsv_path}")
-            return None
+    # Determine if file is TSV or CSV based on the header line
+    first_line = buffer.readline()
+    separator = '\t' if b'\t' in first_line else ','
+    buffer.seek(0)
 
-        # Download TSV content to a string
-        tsv_content = blob.download_as_string().decode('utf-8')
-
-        # Determine if file is TSV or CSV based on content
-        if '\t' in tsv_content.split('\n')[0]:
-            # Read as TSV
-            # df = pd.read_csv(io.StringIO(tsv_content), sep='\t', storage_options={"token": gcp_credentials})
-            df = pd.read_csv("gs://natify/final_audio/filtered_results.tsv", sep='\t', storage_options={"token": gcp_credentials})
-        else:
-            # Read as CSV
-            # df = pd.read_csv(io.StringIO(tsv_content), storage_options={"token": gcp_credentials})
-            df = pd.read_csv("gs://natify/final_audio/filtered_results.tsv", storage_options={"token": gcp_credentials})
-
-        # Make sure required columns exist
-        required_columns = ['sentence', 'path']
-        if not all(col in df.columns for col in required_columns):
-            st.error(f"Data file must contain these columns: {required_columns}")
-            return None
+    df = pd.read_csv(buffer, sep=separator)
 
-        # Clean up the DataFrame
-        df = df.dropna(subset=['sentence', 'path'])
+    # Make sure required columns exist
+    required_columns = ['sentence', 'path']
+    if not all(col in df.columns for col in required_columns):
+        raise ValueError(f"Data file must contain these columns: {required_columns}")
 
-        # Normalize paths - ensure they're valid for GCS
-        # If paths don't start with '/', add it (common GCS issue)
-        if 'path' in df.columns:
-            # Extract the directory from the TSV path
-            tsv_dir = os.path.dirname(tsv_path)
+    # Clean up the DataFrame
+    df = df.dropna(subset=['sentence', 'path'])
 
-            # Function to fix relative paths
-            def fix_path(path):
-                # If the path is already absolute (starts with gs:// or /), return as is
-                if path.startswith('gs://') or path.startswith('/'):
-                    return path
+    # Normalize paths - ensure they're valid for GCS
+    # If paths don't start with '/', add it (common GCS issue)
+    tsv_dir = os.path.dirname(tsv_path)
+    if 'path' in df.columns:
+        df['path'] = fix_paths(df['path'], tsv_dir)
 
-                # If the path is relative, join it with the TSV directory
-                if tsv_dir:
-                    return os.path.join(tsv_dir, path)
-                return path
+    # Add difficulty column based on sentence length and complexity
+    df['difficulty'] = determine_difficulties(df['sentence'])
 
-            # Apply the fix to all paths
-            df['path'] = df['path'].apply(fix_path)
+    # Add translation column if not present - silently add placeholders without showing a message
+    if 'translation' not in df.columns:
+        # Just add placeholder values - we'll translate on demand later
+        df['translation'] = "Translation not available"
 
-        # Add difficulty column based on sentence length and complexity
-        def determine_difficulty(sentence):
-            words = len(sentence.split())
-            if words <= 3:
-                return "easy"
-            elif words <= 8:
-                return "medium"
-            else:
-                return "difficult"
+    # List the audio objects once so existence checks don't need a request each
+    gcs_prefix = tsv_dir.rstrip('/') + '/' if tsv_dir else ''
+    gcs_index = list_blob_sizes(bucket_name, gcs_prefix)
+    if gcs_index is not None:
+        df.attrs['gcs_prefix'] = gcs_prefix
+        df.attrs['gcs_index'] = SharedIndex(gcs_index)
 
-        df['difficulty'] = df['sentence'].apply(determine_difficulty)
+    return build_sentence_indexes(df)
 
-        # Add translation column if not present - silently add placeholders without showing a message
-        if 'translation' not in df.columns:
-            # Just add placeholder values - we'll translate on demand later
-            df['translation'] = "Translation not available"
+def load_sentences_dataframe_from_gcs(bucket_name, tsv_path):
+    """
+    Load the DataFrame containing sentences and audio filenames from Google Cloud Storage.
+    Handles file paths more robustly.
 
-        return df
+    Args:
+        bucket_name: Name of the GCS bucket
+        tsv_path: Path to the TSV file in the bucket
 
+    Returns:
+        DataFrame with sentences and audio information, or None if loading fails
+    """
+    try:
+        return _load_sentences_dataframe(bucket_name, tsv_path)
+    except (FileNotFoundError, ValueError) as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Error loading DataFrame from GCS: {e}")
         return None
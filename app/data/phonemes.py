@@ -2,6 +2,9 @@
 Phoneme data and mappings for the Indonesian Pronunciation App.
 """
 
+import re
+from functools import lru_cache
+
 # Define phoneme mapping for Indonesian
 indonesian_phonemes = {
     'a': 'a',
@@ -36,6 +39,57 @@ indonesian_phonemes = {
     'kh': 'x',
 }
 
+# Mappings from raw extracted symbols to standard IPA for Indonesian
+standard_phoneme_map = {
+    # Vowels
+    'a': 'a',   # like in "father"
+    'i': 'i',   # like in "machine"
+    'u': 'u',   # like in "food"
+    'e': 'e',   # like in "bet"
+    'ə': 'ə',   # schwa sound
+    'o': 'o',   # like in "go"
+
+    # Consonants
+    'b': 'b',
+    'c': 'tʃ',  # like "ch" in "chair"
+    'd': 'd',
+    'f': 'f',
+    'g': 'g',
+    'h': 'h',
+    'j': 'dʒ',  # like "j" in "jump"
+    'k': 'k',
+    'l': 'l',
+    'm': 'm',
+    'n': 'n',
+    'p': 'p',
+    'q': 'k',
+    'r': 'r',   # slightly rolled
+    's': 's',
+    't': 't',
+    'v': 'v',
+    'w': 'w',
+    'x': 'ks',
+    'y': 'j',
+    'z': 'z',
+
+    # Special consonant clusters
+    'ng': 'ŋ',  # like in "singer"
+    'ny': 'ɲ',  # like "ny" in "canyon"
+    'sy': 'ʃ',  # like "sh" in "ship"
+    'kh': 'x',  # velar fricative
+}
+
+# Single regex matching any mapped symbol, longest first so digraphs win
+_STANDARD_PHONEME_RE = re.compile(
+    '|'.join(map(re.escape, sorted(standard_phoneme_map, key=len, reverse=True)))
+)
+
+# Translation table for the common case where no digraph is present
+_SINGLE_PHONEME_TABLE = str.maketrans(
+    {k: v for k, v in standard_phoneme_map.items() if len(k) == 1}
+)
+_PHONEME_DIGRAPHS = tuple(k for k in standard_phoneme_map if len(k) > 1)
+
 def map_to_standard_indonesian_phonemes(phoneme_string):
     """
     Map the extracted phoneme symbols to standard Indonesian phoneme representations
@@ -46,68 +100,12 @@ def map_to_standard_indonesian_phonemes(phoneme_string):
     Returns:
         String with standardized Indonesian phoneme representations
     """
-    # Define mappings from raw extracted symbols to standard IPA for Indonesian
-    indonesian_phoneme_map = {
-        # Vowels
-        'a': 'a',   # like in "father"
-        'i': 'i',   # like in "machine"
-        'u': 'u',   # like in "food"
-        'e': 'e',   # like in "bet"
-        'ə': 'ə',   # schwa sound
-        'o': 'o',   # like in "go"
-
-        # Consonants
-        'b': 'b',
-        'c': 'tʃ',  # like "ch" in "chair"
-        'd': 'd',
-        'f': 'f',
-        'g': 'g',
-        'h': 'h',
-        'j': 'dʒ',  # like "j" in "jump"
-        'k': 'k',
-        'l': 'l',
-        'm': 'm',
-        'n': 'n',
-        'p': 'p',
-        'q': 'k',
-        'r': 'r',   # slightly rolled
-        's': 's',
-        't': 't',
-        'v': 'v',
-        'w': 'w',
-        'x': 'ks',
-        'y': 'j',
-        'z': 'z',
-
-        # Special consonant clusters
-        'ng': 'ŋ',  # like in "singer"
-        'ny': 'ɲ',  # like "ny" in "canyon"
-        'sy': 'ʃ',  # like "sh" in "ship"
-        'kh': 'x',  # velar fricative
-    }
-
-    # Process the string to map to standard representations
-    standardized = ""
-    i = 0
-    while i < len(phoneme_string):
-        # Check for digraphs first (2-character phonemes)
-        if i < len(phoneme_string) - 1:
-            digraph = phoneme_string[i:i+2]
-            if digraph in indonesian_phoneme_map:
-                standardized += indonesian_phoneme_map[digraph]
-                i += 2
-                continue
-
-        # Handle single characters
-        char = phoneme_string[i]
-        if char in indonesian_phoneme_map:
-            standardized += indonesian_phoneme_map[char]
-        else:
-            # If not in map, keep original
-            standardized += char
-        i += 1
-
-    return standardized
+    # Without digraphs every symbol maps independently
+    if not any(digraph in phoneme_string for digraph in _PHONEME_DIGRAPHS):
+        return phoneme_string.translate(_SINGLE_PHONEME_TABLE)
+
+    # Digraphs are matched before single characters; anything unmapped is kept
+    return _STANDARD_PHONEME_RE.sub(lambda m: standard_phoneme_map[m.group(0)], phoneme_string)
 
 # Common pronunciation challenges for Indonesian learners
 pronunciation_challenges = {
@@ -122,6 +120,38 @@ pronunciation_challenges = {
     'au': "The diphthong 'au' is pronounced like 'ow' in 'how', not as separate vowels"
 }
 
+@lru_cache(maxsize=8)
+def _challenge_matcher(challenge_keys):
+    """
+    Build a regex finding every challenge key in a string, plus the keys' original order.
+
+    Args:
+        challenge_keys: Tuple of challenge keys in dictionary order
+
+    Returns:
+        Tuple of (compiled pattern, dict mapping key to its position)
+    """
+    # A lookahead lets matches overlap, so 'u' is still found inside 'au'
+    alternation = '|'.join(map(re.escape, sorted(challenge_keys, key=len, reverse=True)))
+    pattern = re.compile(f'(?=({alternation}))')
+    order = {key: position for position, key in enumerate(challenge_keys)}
+    return pattern, order
+
+def find_challenge_phonemes(text, challenges=pronunciation_challenges):
+    """
+    Find which challenge phonemes occur in a piece of text with a single scan.
+
+    Args:
+        text: Text or phoneme segment to search
+        challenges: Dictionary of pronunciation challenges
+
+    Returns:
+        List of challenge keys found in text, in dictionary order
+    """
+    pattern, order = _challenge_matcher(tuple(challenges))
+    found = {match.group(1) for match in pattern.finditer(text)}
+    return sorted(found, key=order.get)
+
 def identify_challenges(phoneme_comparison, pronunciation_challenges):
     """
     Identify common pronunciation challenges based on phoneme comparison.
@@ -136,12 +166,14 @@ def identify_challenges(phoneme_comparison, pronunciation_challenges):
     challenges = []
 
     for match_type, expected, actual in phoneme_comparison:
-        if match_type != "match":
-            # Check for specific challenging phonemes
-            for key, description in pronunciation_challenges.items():
-                if key in expected:
-                    if (match_type == "replace" and key not in actual) or match_type == "delete":
-                        challenges.append((key, description))
+        # Only replaced or missing sounds can point to a challenge
+        if match_type not in ("replace", "delete"):
+            continue
+
+        # Find the challenging phonemes in a single pass over the expected segment
+        for key in find_challenge_phonemes(expected, pronunciation_challenges):
+            if match_type == "delete" or key not in actual:
+                challenges.append((key, pronunciation_challenges[key]))
 
     # Remove duplicates while preserving order
     return list(dict.fromkeys(challenges))
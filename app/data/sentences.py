@@ -4,11 +4,13 @@ Sentence data and audio management for the Indonesian Pronunciation App.
 
 import streamlit as st
 import os
+import io
 import tempfile
-import librosa
 import soundfile as sf
+import soxr
+import pandas as pd
 from gtts import gTTS
-from app.data.gcs import download_blob_to_temp
+from app.data.gcs import download_blob_to_temp, blob_exists, build_sentence_indexes
 
 # Create a database of Indonesian sentences with different difficulty levels
 sentences_db = {
@@ -70,6 +72,27 @@ sentences_db = {
     ]
 }
 
+# Flattened view of sentences_db with the same columns as the GCS DataFrame
+_SENTENCES_DF = pd.DataFrame([
+    {"sentence": item["sentence"], "translation": item["translation"], "difficulty": difficulty}
+    for difficulty, items in sentences_db.items()
+    for item in items
+])
+
+def get_sentences(difficulty=None):
+    """
+    Get the built-in sentences, optionally filtered by difficulty.
+
+    Args:
+        difficulty: Difficulty level to filter by (None for all sentences)
+
+    Returns:
+        DataFrame with sentence, translation and difficulty columns
+    """
+    if difficulty is None:
+        return _SENTENCES_DF
+    return _SENTENCES_DF[_SENTENCES_DF['difficulty'] == difficulty]
+
 def setup_common_voice_data():
     """
     Simplified function to provide basic structure for Common Voice data.
@@ -83,6 +106,65 @@ def setup_common_voice_data():
         "clips": []  # We don't need to populate this as we're using TTS
     }
 
+def _existing_cached_path(cached_func, *args):
+    """
+    Call a cached function that returns a file path, regenerating the file if it was deleted.
+
+    Cached paths are shared by all sessions and outlive their files when the
+    temporary directory is cleaned, so a hit is only trusted if the file exists.
+
+    Args:
+        cached_func: st.cache_data function returning a file path
+        *args: Arguments for cached_func
+
+    Returns:
+        Path to an existing file
+    """
+    path = cached_func(*args)
+    if not os.path.exists(path):
+        # Drop just this entry and produce the file again
+        cached_func.clear(*args)
+        path = cached_func(*args)
+    return path
+
+def _mp3_to_wav(mp3_path, target_sr):
+    """
+    Convert an MP3 file to a temporary WAV file.
+
+    Args:
+        mp3_path: Path to the MP3 file
+        target_sr: Target sample rate in Hz
+
+    Returns:
+        Path to the converted WAV file
+    """
+    # Load the MP3 file with librosa (slow to import, and only needed for this fallback)
+    import librosa
+    y, sr = librosa.load(mp3_path, sr=target_sr)
+
+    # Create a temporary WAV file
+    temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
+    sf.write(temp_wav.name, y, target_sr)
+    temp_wav.close()
+
+    return temp_wav.name
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _convert_mp3_to_wav_cached(mp3_path, mtime_ns, size, target_sr):
+    """
+    Convert an MP3 file to WAV, memoized. Raises on failure, so failures are not cached.
+
+    Args:
+        mp3_path: Path to the MP3 file
+        mtime_ns: Modification time of the file (part of the cache key only)
+        size: Size of the file in bytes (part of the cache key only)
+        target_sr: Target sample rate in Hz
+
+    Returns:
+        Path to the converted WAV file
+    """
+    return _mp3_to_wav(mp3_path, target_sr)
+
 def convert_mp3_to_wav(mp3_path, target_sr=16000):
     """
     Convert an MP3 file to WAV with a specific sample rate.
@@ -95,27 +177,24 @@ def convert_mp3_to_wav(mp3_path, target_sr=16000):
         Path to the converted WAV file
     """
     try:
-        # Load the MP3 file with librosa
-        y, sr = librosa.load(mp3_path, sr=target_sr)
-
-        # Create a temporary WAV file
-        temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        sf.write(temp_wav.name, y, target_sr)
-        temp_wav.close()
-
-        return temp_wav.name
+        # Key the cache on modification time and size so rewritten files are converted again
+        stat = os.stat(mp3_path)
+        return _existing_cached_path(
+            _convert_mp3_to_wav_cached, mp3_path, stat.st_mtime_ns, stat.st_size, target_sr
+        )
     except Exception as e:
         st.error(f"Error converting MP3 to WAV: {e}")
         return None
 
-def generate_audio(text, lang='id', target_sr=16000):
+@st.cache_data(show_spinner=False, max_entries=256)
+def _generate_audio_cached(text, lang, target_sr):
     """
-    Generate audio from text with a consistent sample rate.
+    Generate speech for text as a temporary WAV file. Raises on failure, so failures are not cached.
 
     Args:
         text: The text to convert to speech
-        lang: The language code (default: 'id' for Indonesian)
-        target_sr: Target sample rate in Hz (default: 16000)
+        lang: The language code
+        target_sr: Target sample rate in Hz
 
     Returns:
         Path to a temporary WAV file with the specified sample rate
@@ -123,96 +202,106 @@ def generate_audio(text, lang='id', target_sr=16000):
     # Use gTTS to generate speech
     tts = gTTS(text=text, lang=lang, slow=False)
 
-    # Save to a temporary MP3 file first
-    temp_mp3 = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
-    tts.save(temp_mp3.name)
-    temp_mp3.close()
+    # Keep the MP3 in memory and decode it directly with soundfile
+    mp3_buffer = io.BytesIO()
+    tts.write_to_fp(mp3_buffer)
+    mp3_buffer.seek(0)
+
+    try:
+        y, sr = sf.read(mp3_buffer, dtype='float32')
+    except Exception:
+        # Older libsndfile builds cannot decode MP3, so go through a file instead
+        temp_mp3 = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
+        temp_mp3.write(mp3_buffer.getvalue())
+        temp_mp3.close()
+        try:
+            return _mp3_to_wav(temp_mp3.name, target_sr)
+        finally:
+            os.unlink(temp_mp3.name)
+
+    if y.ndim > 1:
+        y = y.mean(axis=1)
+    if sr != target_sr:
+        y = soxr.resample(y, sr, target_sr)
+
+    # Write the WAV with the target sample rate once
+    temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
+    sf.write(temp_wav.name, y, target_sr)
+    temp_wav.close()
+
+    return temp_wav.name
 
-    # Convert the MP3 to WAV with the target sample rate
-    wav_path = convert_mp3_to_wav(temp_mp3.name, target_sr)
+def generate_audio(text, lang='id', target_sr=16000):
+    """
+    Generate audio from text with a consistent sample rate.
 
-    # Clean up the MP3 file
-    os.unlink(temp_mp3.name)
+    Args:
+        text: The text to convert to speech
+        lang: The language code (default: 'id' for Indonesian)
+        target_sr: Target sample rate in Hz (default: 16000)
 
-    return wav_path
+    Returns:
+        Path to a temporary WAV file with the specified sample rate
+    """
+    return _existing_cached_path(_generate_audio_cached, text, lang, target_sr)
 
-def ensure_correct_sample_rate(audio_path, target_sr=16000):
+@st.cache_data(show_spinner=False, max_entries=256)
+def _ensure_sample_rate_cached(audio_path, mtime_ns, size, target_sr):
     """
-    Ensure audio file has the correct sample rate.
+    Resample an audio file to a temporary WAV file if needed. Raises on failure, so failures are not cached.
 
     Args:
         audio_path: Path to the audio file
+        mtime_ns: Modification time of the file (part of the cache key only)
+        size: Size of the file in bytes (part of the cache key only)
         target_sr: Target sample rate in Hz
 
     Returns:
         Path to a WAV file with the specified sample rate
     """
-    try:
-        # Check if file is MP3
-        if audio_path.lower().endswith('.mp3'):
-            return convert_mp3_to_wav(audio_path, target_sr)
+    # Check if file is MP3
+    if audio_path.lower().endswith('.mp3'):
+        return _mp3_to_wav(audio_path, target_sr)
 
-        # For WAV files, check the current sample rate
-        y, sr = librosa.load(audio_path, sr=None)
-
-        # If sample rate already matches, just return the path
-        if sr == target_sr:
-            return audio_path
+    # For WAV files, read only the header to check the current sample rate
+    if sf.info(audio_path).samplerate == target_sr:
+        return audio_path
 
-        # Otherwise, resample and save to a temporary file
-        y_resampled = librosa.resample(y, orig_sr=sr, target_sr=target_sr)
+    # Otherwise, decode and resample in memory
+    y, sr = sf.read(audio_path, dtype='float32')
+    if y.ndim > 1:
+        y = y.mean(axis=1)
+    y_resampled = soxr.resample(y, sr, target_sr)
 
-        # Save to a temporary WAV file
-        temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        sf.write(temp_wav.name, y_resampled, target_sr)
-        temp_wav.close()
+    # Save to a temporary WAV file
+    temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
+    sf.write(temp_wav.name, y_resampled, target_sr)
+    temp_wav.close()
 
-        return temp_wav.name
-    except Exception as e:
-        st.error(f"Error processing audio file: {e}")
-        # Fall back to original file
-        return audio_path
+    return temp_wav.name
 
-def normalize_audio(audio_path, target_sr=16000, target_level=-25):
+def ensure_correct_sample_rate(audio_path, target_sr=16000):
     """
-    Normalize audio to a target level and ensure consistent sample rate.
+    Ensure audio file has the correct sample rate.
 
     Args:
         audio_path: Path to the audio file
         target_sr: Target sample rate in Hz
-        target_level: Target RMS level in dB
 
     Returns:
-        Path to normalized audio file
+        Path to a WAV file with the specified sample rate
     """
     try:
-        # Load the audio file with librosa
-        y, sr = librosa.load(audio_path, sr=target_sr)
-
-        # Calculate current RMS energy in dB
-        rms = librosa.feature.rms(y=y)[0]
-        rms_db = 20 * librosa.core.amplitude_to_db(rms.mean(), ref=1.0)
-
-        # Calculate the gain needed
-        gain_db = target_level - rms_db
-        gain_linear = 10 ** (gain_db / 20)
-
-        # Apply gain to normalize volume
-        y_normalized = y * gain_linear
-
-        # Ensure we don't clip the audio
-        if y_normalized.max() > 1.0:
-            y_normalized = y_normalized / y_normalized.max() * 0.9  # Leave some headroom
-
-        # Create a temporary WAV file
-        temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        sf.write(temp_wav.name, y_normalized, target_sr)
-        temp_wav.close()
-
-        return temp_wav.name
+        # Key the cache on modification time and size, since downloads are
+        # rewritten in place when the blob changes
+        stat = os.stat(audio_path)
+        return _existing_cached_path(
+            _ensure_sample_rate_cached, audio_path, stat.st_mtime_ns, stat.st_size, target_sr
+        )
     except Exception as e:
-        st.error(f"Error normalizing audio: {e}")
-        return audio_path  # Return original file as fallback
+        st.error(f"Error processing audio file: {e}")
+        # Fall back to original file
+        return audio_path
 
 def try_download_with_path(bucket_name, file_path, target_sr):
     """
@@ -227,13 +316,6 @@ def try_download_with_path(bucket_name, file_path, target_sr):
         Audio file path if successful, None otherwise
     """
     try:
-        # Ensure we have a valid GCS client
-        if st.session_state.gcs_client is None:
-            from app.data.gcs import initialize_gcs_client
-            st.session_state.gcs_client = initialize_gcs_client(bucket_name)
-            if st.session_state.gcs_client is None:
-                return None
-
         # Download the audio file to a temporary location
         temp_audio_path = download_blob_to_temp(bucket_name, file_path)
 
@@ -247,6 +329,40 @@ def try_download_with_path(bucket_name, file_path, target_sr):
         # Silently fail and return None
         return None
 
+def _update_sentence_path(sentences_df, sentence, old_path, new_path):
+    """
+    Replace an audio path in the sentences DataFrame and keep its indexes in sync.
+
+    Args:
+        sentences_df: DataFrame containing sentences and audio paths
+        sentence: Sentence whose audio path changed
+        old_path: Previous audio path
+        new_path: Audio path that was found in the bucket
+    """
+    path_index = sentences_df.attrs['path_index']
+    labels = path_index.pop(old_path, [])
+    if labels:
+        sentences_df.loc[labels, 'path'] = new_path
+        path_index.setdefault(new_path, []).extend(labels)
+    sentences_df.attrs['sentence_index'][sentence] = new_path
+
+def _audio_exists(sentences_df, bucket_name, path):
+    """
+    Check whether an audio path exists, using the listing taken at load time when possible.
+
+    Args:
+        sentences_df: DataFrame containing sentences and audio paths
+        bucket_name: Google Cloud Storage bucket name
+        path: Path to the audio file in the bucket
+
+    Returns:
+        True if the audio file exists
+    """
+    gcs_index = sentences_df.attrs.get('gcs_index')
+    if gcs_index is not None and path.startswith(sentences_df.attrs.get('gcs_prefix', '')):
+        return path in gcs_index
+    return blob_exists(bucket_name, path)
+
 def get_audio_from_gcs(sentence, sentences_df, bucket_name, fallback_to_tts=True, target_sr=16000):
     """
     Get audio for a sentence from Google Cloud Storage, handling extension mismatches silently.
@@ -268,41 +384,31 @@ def get_audio_from_gcs(sentence, sentences_df, bucket_name, fallback_to_tts=True
             return generate_audio(sentence, target_sr=target_sr)
         return None
 
-    # Look for the sentence in the DataFrame
-    matches = sentences_df[sentences_df['sentence'] == sentence]
+    # Look up the sentence in the prebuilt index instead of scanning the DataFrame
+    if 'sentence_index' not in sentences_df.attrs:
+        build_sentence_indexes(sentences_df)
+    file_path = sentences_df.attrs['sentence_index'].get(sentence)
 
-    if not matches.empty:
-        # Use the first match
-        file_path = matches.iloc[0]['path']
+    if file_path is not None:
         original_path = file_path
 
-        # Try the path as is first
-        audio_path = try_download_with_path(bucket_name, file_path, target_sr)
-        if audio_path:
-            return audio_path
-
-        # If that fails, try alternative extensions silently
+        # Candidate paths: as listed first, then with the alternative extension
+        candidate_paths = [file_path]
         if file_path.lower().endswith('.wav'):
-            # Try with .mp3 instead
-            mp3_path = file_path[:-4] + '.mp3'
-            audio_path = try_download_with_path(bucket_name, mp3_path, target_sr)
-            if audio_path:
-                # Update the path in the DataFrame for future reference
-                if 'path' in sentences_df.columns:
-                    idx = sentences_df[sentences_df['path'] == original_path].index
-                    if len(idx) > 0:
-                        sentences_df.loc[idx, 'path'] = mp3_path
-                return audio_path
+            candidate_paths.append(file_path[:-4] + '.mp3')
         elif file_path.lower().endswith('.mp3'):
-            # Try with .wav instead
-            wav_path = file_path[:-4] + '.wav'
-            audio_path = try_download_with_path(bucket_name, wav_path, target_sr)
+            candidate_paths.append(file_path[:-4] + '.wav')
+
+        # Check existence without downloading and fetch only the path that exists
+        existing_path = next(
+            (path for path in candidate_paths if _audio_exists(sentences_df, bucket_name, path)), None
+        )
+        if existing_path:
+            audio_path = try_download_with_path(bucket_name, existing_path, target_sr)
             if audio_path:
-                # Update the path in the DataFrame for future reference
-                if 'path' in sentences_df.columns:
-                    idx = sentences_df[sentences_df['path'] == original_path].index
-                    if len(idx) > 0:
-                        sentences_df.loc[idx, 'path'] = wav_path
+                if existing_path != original_path:
+                    # Update the path in the DataFrame for future reference
+                    _update_sentence_path(sentences_df, sentence, original_path, existing_path)
                 return audio_path
 
         # If we're here, file wasn't found with either extension
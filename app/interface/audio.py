@@ -4,38 +4,74 @@ Using Streamlit's built-in audio recorder with fallback to sounddevice.
 """
 
 import streamlit as st
-import sounddevice as sd
 import soundfile as sf
+import soxr
 import time
 import tempfile
 import numpy as np
-import matplotlib.pyplot as plt
-import librosa
+import io
 import os
+import shutil
+import struct
 import traceback
-import importlib
-import sys
-
+from functools import lru_cache
+from app.utils.audio_processing import load_audio
+
+# librosa, matplotlib, sounddevice and numba are slow to import (numba warm-up,
+# font cache, PortAudio, LLVM), so they are imported inside the functions that use them.
+
+# Maximum number of points drawn for a waveform plot
+WAVEFORM_MAX_POINTS = 2000
+
+# Progress bar updates per second while recording
+PROGRESS_UPDATES_PER_SECOND = 4
+
+# Cell colors for each phoneme match type
+phoneme_match_colors = {
+    "match": "#c6efce",    # Light green
+    "replace": "#ffeb9c",  # Light yellow
+    "delete": "#ffc7ce",   # Light red
+    "insert": "#b7dee8",   # Light blue
+    "perfect": "#c6efce"   # Same as match (light green)
+}
+
+# Legend labels for each phoneme match type
+phoneme_match_labels = {
+    "match": "Match",
+    "replace": "Different",
+    "delete": "Missing",
+    "insert": "Extra",
+    "perfect": "Perfect Match"
+}
+
+# Peak-to-peak int16 range below which a recording is considered too quiet (2% of full scale)
+SILENCE_PEAK_TO_PEAK = 655
+
+# Longest recording allowed by the sounddevice recorder, in seconds
+MAX_RECORDING_SECONDS = 10
+
+@st.cache_resource(ttl=60, show_spinner=False)
 def list_audio_devices():
     """
     List all available audio input devices.
     In cloud deployment, this will return a mock device list.
 
+    The result is cached for a minute since querying PortAudio is slow
+    and the device list rarely changes.
+
     Returns:
         List of audio input devices
     """
     try:
+        import sounddevice as sd
         devices = sd.query_devices()
-        input_devices = []
-
-        for i, device in enumerate(devices):
-            if device['max_input_channels'] > 0:
-                # Format device info for display
-                input_devices.append({
-                    'id': i,
-                    'name': device['name'],
-                    'channels': device['max_input_channels']
-                })
+
+        # Format device info for display
+        input_devices = [
+            {'id': i, 'name': device['name'], 'channels': device['max_input_channels']}
+            for i, device in enumerate(devices)
+            if device['max_input_channels'] > 0
+        ]
     except Exception as e:
         # If sounddevice fails, return a mock device
         input_devices = [{
@@ -54,6 +90,12 @@ def list_audio_devices():
 
     return input_devices
 
+def refresh_audio_devices():
+    """
+    Forget the cached device list so the next call to list_audio_devices queries PortAudio again.
+    """
+    list_audio_devices.clear()
+
 def record_audio(duration=3, sample_rate=16000):
     """
     Record audio using Streamlit's built-in audio_recorder when available,
@@ -107,29 +149,37 @@ def _record_audio_streamlit(duration=3, sample_rate=16000):
             try:
                 status_container.success("Recording received. Processing audio...")
 
-                # Safer approach: first save the audio bytes to a temporary file
+                # Browsers that already record mono audio at the target rate
+                # need no decode/resample/re-encode round trip
                 try:
-                    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-                    temp_file.write(audio_bytes)
-                    temp_file.close()
-                except Exception as e:
-                    status_container.error(f"Failed to save recorded audio: {str(e)}")
-                    status_container.empty()
-                    return _create_silent_audio(duration, sample_rate)
+                    info = sf.info(io.BytesIO(audio_bytes))
+                    already_processed = _is_already_processed(info, duration, sample_rate)
+                except Exception:
+                    info = None
+                    already_processed = False
 
-                # Check if the file exists and has content
-                if not os.path.exists(temp_file.name) or os.path.getsize(temp_file.name) == 0:
-                    status_container.warning("Recorded file is empty or missing.")
-                    status_container.empty()
-                    return _create_silent_audio(duration, sample_rate)
-
-                # Process the audio defensively with try/except
                 try:
-                    processed_file = _process_audio_file(temp_file.name, duration, sample_rate)
+                    if already_processed:
+                        processed_file = _save_audio_bytes(audio_bytes)
+                    elif info is not None:
+                        # Decode straight from memory so only the processed file touches disk
+                        audio_data, orig_sr = sf.read(io.BytesIO(audio_bytes), dtype='float32')
+                        if audio_data.ndim > 1:
+                            audio_data = audio_data.mean(axis=1, dtype=np.float32)
+                        processed_file = _process_audio_data(audio_data, orig_sr, duration, sample_rate)
+                    else:
+                        # soundfile cannot decode this format, so go through a file for librosa
+                        temp_path = _save_audio_bytes(audio_bytes)
+                        processed_file = temp_path
+                        try:
+                            processed_file = _process_audio_file(temp_path, duration, sample_rate)
+                        finally:
+                            if processed_file != temp_path:
+                                os.unlink(temp_path)
                 except Exception as e:
                     status_container.error(f"Error processing audio: {str(e)}")
-                    # Return the original file if processing fails
-                    processed_file = temp_file.name
+                    status_container.empty()
+                    return _create_silent_audio(duration, sample_rate)
 
                 # Check the processed file
                 if not os.path.exists(processed_file):
@@ -137,13 +187,6 @@ def _record_audio_streamlit(duration=3, sample_rate=16000):
                     status_container.empty()
                     return _create_silent_audio(duration, sample_rate)
 
-                # Clean up original temp file if needed
-                if processed_file != temp_file.name and os.path.exists(temp_file.name):
-                    try:
-                        os.unlink(temp_file.name)
-                    except:
-                        pass
-
                 status_container.empty()
                 return processed_file
 
@@ -176,7 +219,7 @@ def _record_audio_sounddevice(duration=3, sample_rate=16000):
         String: Path to the recorded audio file
     """
     # Ensure duration is a reasonable value
-    duration = max(1, min(10, duration))  # Between 1 and 10 seconds
+    duration = max(1, min(MAX_RECORDING_SECONDS, duration))  # Between 1 and 10 seconds
 
     # Create UI elements
     record_container = st.empty()
@@ -187,20 +230,15 @@ def _record_audio_sounddevice(duration=3, sample_rate=16000):
         # Get the selected input device ID from session state
         device_id = st.session_state.get('input_device_id', None)
 
-        # Get device list and try to validate the selected device
-        devices = list_audio_devices()
-        valid_device = False
-        device_name = "Default"
-
-        for device in devices:
-            if device['id'] == device_id:
-                valid_device = True
-                device_name = device['name']
-                break
+        # Validate the selected device against the cached device list
+        device_name = next(
+            (device['name'] for device in list_audio_devices() if device['id'] == device_id), None
+        )
 
-        if not valid_device:
+        if device_name is None:
             status_container.warning("Selected audio device not found, using default.")
             device_id = None
+            device_name = "Default"
 
         # Display recording status
         record_container.markdown(f"🎙️ Recording from **{device_name}**... Please speak clearly!")
@@ -210,40 +248,50 @@ def _record_audio_sounddevice(duration=3, sample_rate=16000):
 
         # Start recording with exception handling
         try:
+            import sounddevice as sd
+
             # First check if sounddevice can initialize
             sd.check_input_settings(
                 device=device_id,
                 channels=1,
                 samplerate=sample_rate,
-                dtype='float32'
+                dtype='int16'
             )
 
-            # Start the recording
-            recording = sd.rec(
-                int(duration * sample_rate),
+            # Start the recording into a buffer of its own; sessions can record concurrently
+            frames = int(duration * sample_rate)
+            recording = np.empty((frames, 1), dtype=np.int16)
+            sd.rec(
+                frames,
                 samplerate=sample_rate,
                 channels=1,
-                device=device_id  # Use the selected device or default
+                device=device_id,  # Use the selected device or default
+                dtype='int16',
+                out=recording
             )
 
-            # Update progress bar
-            for i in range(100):
-                time.sleep(duration/100)
-                progress_bar.progress(i + 1)
-                remaining = duration - (i+1) * duration/100
-                status_container.text(f"Recording... {remaining:.1f} seconds remaining.")
+            # Update progress bar a few times per second instead of 100 times;
+            # the status text is set once since every update is a round trip
+            status_container.text(f"Recording for {duration} seconds...")
+            ticks = max(1, int(duration * PROGRESS_UPDATES_PER_SECOND))
+            for i in range(ticks):
+                time.sleep(duration / ticks)
+                progress_bar.progress(int((i + 1) * 100 / ticks))
 
             # Ensure recording is complete
             sd.wait()
             status_container.success("Recording completed successfully!")
 
             # Check if recording contains actual sound data
-            if np.max(np.abs(recording)) < 0.01:
+            # (peak-to-peak range avoids allocating an abs() copy of the buffer;
+            # the bounds are widened to int so the int16 difference can't overflow)
+            if int(recording.max()) - int(recording.min()) < SILENCE_PEAK_TO_PEAK:
                 status_container.warning("Recording seems too quiet. Please speak louder next time.")
 
             # Save the recording to a temporary file
             temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-            sf.write(temp_file.name, recording, sample_rate)
+            temp_file.close()
+            _write_wav_pcm16(temp_file.name, recording, sample_rate)
             return temp_file.name
 
         except Exception as e:
@@ -267,6 +315,65 @@ def _record_audio_sounddevice(duration=3, sample_rate=16000):
         progress_container.empty()
         status_container.empty()
 
+def _save_audio_bytes(audio_bytes):
+    """
+    Save encoded audio bytes to a temporary WAV file with a single buffered write.
+
+    Args:
+        audio_bytes: Encoded audio file contents
+
+    Returns:
+        Path to the temporary file
+    """
+    fd, temp_path = tempfile.mkstemp(suffix='.wav')
+    with os.fdopen(fd, 'wb', buffering=1 << 20) as f:
+        f.write(audio_bytes)
+    return temp_path
+
+def _write_wav_pcm16(path, y, sample_rate):
+    """
+    Write mono audio as a 16-bit PCM WAV file with a single buffered write.
+
+    Args:
+        path: Destination file path
+        y: Float samples in [-1, 1] or int16 samples (any shape, flattened to mono)
+        sample_rate: Sample rate in Hz
+    """
+    if y.dtype == np.int16:
+        # Already PCM16, so no conversion is needed
+        data = np.ascontiguousarray(np.ravel(y), dtype='<i2').tobytes()
+    else:
+        pcm = np.clip(np.ravel(y), -1.0, 1.0)
+        data = np.ascontiguousarray((pcm * 32767).astype('<i2')).tobytes()
+
+    # Standard 44-byte RIFF header for 1 channel, 16 bits per sample
+    header = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + len(data), b'WAVE',
+        b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b'data', len(data)
+    )
+    with open(path, 'wb', buffering=1 << 20) as f:
+        f.write(header)
+        f.write(data)
+
+def _is_already_processed(info, target_duration, target_sr):
+    """
+    Check from file metadata alone whether audio needs no resampling, trimming or padding.
+
+    Args:
+        info: soundfile info for the audio
+        target_duration: Target duration in seconds
+        target_sr: Target sample rate
+
+    Returns:
+        True if the audio is mono at target_sr and within the duration band
+        that _process_audio_data leaves unchanged
+    """
+    duration = info.frames / target_sr
+    return (info.samplerate == target_sr and info.channels == 1
+            and target_duration * 0.5 <= duration <= target_duration * 1.5)
+
 def _process_audio_file(audio_path, target_duration, target_sr=16000):
     """
     Process an audio file to ensure it meets the required specifications,
@@ -290,21 +397,50 @@ def _process_audio_file(audio_path, target_duration, target_sr=16000):
             st.error(f"Audio file is empty: {audio_path}")
             return _create_silent_audio(target_duration, target_sr)
 
+        # Files that already meet the specifications are used as they are
+        try:
+            if _is_already_processed(sf.info(audio_path), target_duration, target_sr):
+                return audio_path
+        except Exception:
+            pass
+
         # Try loading with scipy first (more reliable for WAV files)
         try:
             # Try using soundfile first (faster and more reliable for WAV)
-            audio_data, orig_sr = sf.read(audio_path)
+            audio_data, orig_sr = sf.read(audio_path, dtype='float32')
             # Convert to mono if stereo
-            if len(audio_data.shape) > 1 and audio_data.shape[1] > 1:
-                audio_data = np.mean(audio_data, axis=1)
+            if audio_data.ndim > 1:
+                audio_data = audio_data.mean(axis=1, dtype=np.float32)
         except Exception as sf_error:
             # Fall back to librosa if soundfile fails
             try:
+                import librosa
                 audio_data, orig_sr = librosa.load(audio_path, sr=None, mono=True)
             except Exception as librosa_error:
                 st.error(f"Failed to read audio with both soundfile ({sf_error}) and librosa ({librosa_error})")
                 return _create_silent_audio(target_duration, target_sr)
 
+        return _process_audio_data(audio_data, orig_sr, target_duration, target_sr)
+
+    except Exception as e:
+        st.error(f"Unexpected error processing audio: {str(e)}")
+        # Return a silent audio file if processing completely fails
+        return _create_silent_audio(target_duration, target_sr)
+
+def _process_audio_data(audio_data, orig_sr, target_duration, target_sr=16000):
+    """
+    Resample, fit to duration, normalize and save decoded mono audio.
+
+    Args:
+        audio_data: Mono audio samples
+        orig_sr: Sample rate of audio_data
+        target_duration: Target duration in seconds
+        target_sr: Target sample rate
+
+    Returns:
+        Path to the processed audio file
+    """
+    try:
         # Validate audio data
         if len(audio_data) == 0:
             st.error("Loaded audio has no samples")
@@ -317,7 +453,7 @@ def _process_audio_file(audio_path, target_duration, target_sr=16000):
         # Resample if needed
         if orig_sr != target_sr:
             try:
-                audio_data = librosa.resample(audio_data, orig_sr=orig_sr, target_sr=target_sr)
+                audio_data = soxr.resample(audio_data, orig_sr, target_sr)
             except Exception as e:
                 st.error(f"Error resampling audio: {str(e)}")
                 # Continue with original audio data
@@ -331,8 +467,8 @@ def _process_audio_file(audio_path, target_duration, target_sr=16000):
             audio_data = audio_data[:int(target_duration * target_sr)]
         elif current_duration < target_duration * 0.5:  # If much shorter, pad with silence
             # Pad with silence to reach target duration
-            padding = np.zeros(int(target_sr * target_duration) - len(audio_data))
-            audio_data = np.concatenate((audio_data, padding))
+            padding = int(target_sr * target_duration) - len(audio_data)
+            audio_data = np.pad(audio_data, (0, max(0, padding)))
 
         # Normalize audio (prevent extreme volumes)
         max_amp = np.max(np.abs(audio_data))
@@ -343,7 +479,7 @@ def _process_audio_file(audio_path, target_duration, target_sr=16000):
         try:
             temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
             temp_file.close()
-            sf.write(temp_file.name, audio_data, target_sr)
+            _write_wav_pcm16(temp_file.name, audio_data, target_sr)
 
             # Verify the file was created successfully
             if not os.path.exists(temp_file.name) or os.path.getsize(temp_file.name) == 0:
@@ -360,13 +496,66 @@ def _process_audio_file(audio_path, target_duration, target_sr=16000):
         # Return a silent audio file if processing completely fails
         return _create_silent_audio(target_duration, target_sr)
 
+@lru_cache(maxsize=8)
+def _silent_audio_template(duration, sample_rate):
+    """Write a silent 16-bit WAV once per (duration, sample_rate) and return its path."""
+    fd, path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    silent_audio = np.zeros(int(sample_rate * duration), dtype=np.int16)
+    sf.write(path, silent_audio, sample_rate, subtype='PCM_16')
+    return path
+
 def _create_silent_audio(duration, sample_rate):
     """Create a silent audio file as a fallback"""
-    silent_audio = np.zeros(int(sample_rate * duration))
+    template = _silent_audio_template(duration, sample_rate)
+    if not os.path.exists(template):
+        # The template was removed from the temp directory, so write it again
+        _silent_audio_template.cache_clear()
+        template = _silent_audio_template(duration, sample_rate)
+
+    # Callers may delete the file they get back, so hand out a copy
     silent_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-    sf.write(silent_file.name, silent_audio, sample_rate)
+    silent_file.close()
+    shutil.copyfile(template, silent_file.name)
     return silent_file.name
 
+def _waveform_envelope(y, max_points=WAVEFORM_MAX_POINTS):
+    """
+    Reduce a signal to per-bucket minima and maxima for plotting.
+
+    Args:
+        y: Audio samples
+        max_points: Maximum number of buckets
+
+    Returns:
+        Tuple: (mins, maxs) arrays of equal length
+    """
+    n_buckets = min(max_points, len(y))
+    if n_buckets == 0:
+        return np.zeros(1), np.zeros(1)
+    chunks = y[:n_buckets * (len(y) // n_buckets)].reshape(n_buckets, -1)
+    return chunks.min(axis=1), chunks.max(axis=1)
+
+def _new_figure(figsize):
+    """
+    Create a Matplotlib figure with a single axes, without going through pyplot.
+
+    Args:
+        figsize: Figure size in inches
+
+    Returns:
+        Tuple: (figure, axes)
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    # Use Figure directly rather than pyplot so nothing is tracked globally
+    # (and nothing has to be closed), and attach the Agg canvas explicitly
+    # so no GUI backend is probed
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot(111)
+
 def plot_waveform(audio_path):
     """
     Plot the waveform of an audio file
@@ -377,26 +566,42 @@ def plot_waveform(audio_path):
     Returns:
         Figure: Matplotlib figure with the waveform
     """
+    fig, ax = _new_figure((10, 2))
     try:
-        y, sr = librosa.load(audio_path, sr=16000)  # Always use 16000 Hz
-        plt.figure(figsize=(10, 2))
-        plt.plot(np.linspace(0, len(y)/sr, len(y)), y)
-        plt.title('Audio Waveform')
-        plt.xlabel('Time (s)')
-        plt.ylabel('Amplitude')
-        plt.tight_layout()
-        fig = plt.gcf()
-        plt.close()
+        y, sr = load_audio(audio_path, 16000)  # Always use 16000 Hz
+        mins, maxs = _waveform_envelope(y)
+        # Draw a min/max envelope rather than every sample
+        ax.fill_between(np.linspace(0, len(y)/sr, len(mins)), mins, maxs, linewidth=0.5)
+        ax.set_title('Audio Waveform')
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel('Amplitude')
+        fig.tight_layout()
         return fig
     except Exception as e:
         st.error(f"Error plotting waveform: {e}")
         # Return a simple figure with error message
-        fig = plt.figure(figsize=(10, 2))
-        plt.text(0.5, 0.5, f"Error generating waveform: {str(e)}",
-                 horizontalalignment='center', verticalalignment='center')
-        plt.close()
+        ax.clear()
+        ax.text(0.5, 0.5, f"Error generating waveform: {str(e)}",
+                horizontalalignment='center', verticalalignment='center')
         return fig
 
+@st.cache_data(show_spinner=False, max_entries=64)
+def _audio_info_cached(audio_path, mtime_ns, size, target_sr):
+    """Compute audio information; mtime and size are part of the cache key only."""
+    from app.utils.kernels import abs_stats
+
+    y, _ = load_audio(audio_path, target_sr)
+    duration = len(y) / target_sr
+    max_amplitude, sum_amplitude = abs_stats(y)
+    mean_amplitude = sum_amplitude / max(len(y), 1)
+    return {
+        "duration": f"{duration:.2f} seconds",
+        "sample_rate": f"{target_sr} Hz",
+        "num_samples": len(y),
+        "max_amplitude": f"{max_amplitude:.4f}",
+        "mean_amplitude": f"{mean_amplitude:.4f}"
+    }
+
 def display_audio_info(audio_path, target_sr=16000):
     """
     Display audio information with consistent sample rate.
@@ -409,16 +614,10 @@ def display_audio_info(audio_path, target_sr=16000):
         Dictionary with audio information
     """
     try:
-        # Always resample to the consistent sample rate for comparison
-        y, _ = librosa.load(audio_path, sr=target_sr)
-        duration = librosa.get_duration(y=y, sr=target_sr)
-        return {
-            "duration": f"{duration:.2f} seconds",
-            "sample_rate": f"{target_sr} Hz",
-            "num_samples": len(y),
-            "max_amplitude": f"{np.max(np.abs(y)):.4f}",
-            "mean_amplitude": f"{np.mean(np.abs(y)):.4f}"
-        }
+        # Always resample to the consistent sample rate for comparison;
+        # the result is reused across reruns until the file changes
+        stat = os.stat(audio_path)
+        return _audio_info_cached(audio_path, stat.st_mtime_ns, stat.st_size, target_sr)
     except Exception as e:
         return {"error": str(e)}
 
@@ -434,59 +633,36 @@ def plot_phoneme_comparison(expected_phonemes, recognized_phonemes, comparison):
     Returns:
         Figure: Matplotlib figure with phoneme comparison
     """
+    fig, ax = _new_figure((10, 3))
     try:
-        # Create a figure
-        fig = plt.figure(figsize=(10, 3))
-        plt.axis('off')  # Hide axes
-        plt.title('Phoneme Comparison: Expected vs. Actual', fontsize=14)
-
-        # Define better colors for each match type
-        colors = {
-            "match": "#c6efce",    # Light green
-            "replace": "#ffeb9c",  # Light yellow
-            "delete": "#ffc7ce",   # Light red
-            "insert": "#b7dee8",   # Light blue
-            "perfect": "#c6efce"   # Same as match (light green)
-        }
-
-        # Define labels for the legend
-        labels = {
-            "match": "Match",
-            "replace": "Different",
-            "delete": "Missing",
-            "insert": "Extra",
-            "perfect": "Perfect Match"
-        }
-
-        # Create visual elements for the legend (excluding "perfect" to avoid duplicate)
-        legend_types = ["match", "replace", "delete", "insert"]
-        for match_type in legend_types:
-            plt.bar(0, 0, color=colors[match_type], label=labels[match_type], alpha=0.7)
+        ax.axis('off')  # Hide axes
+        ax.set_title('Phoneme Comparison: Expected vs. Actual', fontsize=14)
 
-        # Add legend above the comparison table
-        plt.legend(loc='upper center', bbox_to_anchor=(0.5, 1.05),
-                   ncol=4, frameon=False)
+        colors = phoneme_match_colors
+        labels = phoneme_match_labels
 
-        # Prepare data for table
-        expected_row = []
-        recognized_row = []
-        cell_colors = []
+        # Create proxy handles for the legend (excluding "perfect" to avoid duplicate)
+        from matplotlib.patches import Patch
+        legend_types = ["match", "replace", "delete", "insert"]
+        handles = [Patch(facecolor=colors[match_type], label=labels[match_type], alpha=0.7)
+                   for match_type in legend_types]
 
-        # Process comparison data
-        for match_type, exp, rec in comparison:
-            # If it's a perfect match, treat it as a regular match for display
-            if match_type == "perfect":
-                match_type = "match"
+        # Add legend above the comparison table
+        ax.legend(handles=handles, loc='upper center', bbox_to_anchor=(0.5, 1.05),
+                  ncol=4, frameon=False)
 
-            expected_row.append(exp if exp else "-")
-            recognized_row.append(rec if rec else "-")
-            cell_colors.append(colors[match_type])
+        # Unpack the comparison columns once, then build each row from its column
+        # ("perfect" has the same color as "match", so no remapping is needed)
+        match_types, expected, recognized = zip(*comparison) if comparison else ((), (), ())
+        expected_row = [exp or "-" for exp in expected]
+        recognized_row = [rec or "-" for rec in recognized]
+        cell_colors = list(map(colors.__getitem__, match_types))
 
         # Create the table with headers
         cell_text = [expected_row, recognized_row]
 
         # Generate table with colored cells
-        table = plt.table(
+        table = ax.table(
             cellText=cell_text,
             rowLabels=['Expected', 'Actual'],
             loc='center',
@@ -499,15 +675,14 @@ def plot_phoneme_comparison(expected_phonemes, recognized_phonemes, comparison):
         table.set_fontsize(10)
         table.scale(1.2, 1.5)
 
-        plt.tight_layout()
+        fig.tight_layout()
         return fig
     except Exception as e:
         st.error(f"Error creating phoneme visualization: {e}")
         # Return a simple figure with error message
-        fig = plt.figure(figsize=(10, 3))
-        plt.text(0.5, 0.5, f"Error generating phoneme comparison: {str(e)}",
-                 horizontalalignment='center', verticalalignment='center')
-        plt.close()
+        ax.clear()
+        ax.text(0.5, 0.5, f"Error generating phoneme comparison: {str(e)}",
+                horizontalalignment='center', verticalalignment='center')
         return fig
 
 def display_audio_analysis(user_recording, reference_recording):
@@ -526,11 +701,9 @@ def display_audio_analysis(user_recording, reference_recording):
     with col_a:
         st.write("Your Recording:")
         user_audio_info = display_audio_info(user_recording)
-        for key, value in user_audio_info.items():
-            st.write(f"- {key}: {value}")
+        st.markdown("\n".join(f"- {key}: {value}" for key, value in user_audio_info.items()))
 
     with col_b:
         st.write("Reference Audio:")
         ref_audio_info = display_audio_info(reference_recording)
-        for key, value in ref_audio_info.items():
-            st.write(f"- {key}: {value}")
+        st.markdown("\n".join(f"- {key}: {value}" for key, value in ref_audio_info.items()))
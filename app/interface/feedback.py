@@ -3,9 +3,73 @@ Feedback components for the Indonesian Pronunciation App.
 """
 
 import streamlit as st
-import librosa
+import soundfile as sf
 import re
-from app.data.phonemes import pronunciation_challenges
+import heapq
+from collections import defaultdict
+from itertools import islice
+from app.data.phonemes import pronunciation_challenges, find_challenge_phonemes
+
+# Punctuation removed when normalizing text for word identification
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+_PACE_MATCHED = ("success", "Your speaking pace matches the native example very well! This is excellent for developing natural-sounding Indonesian.")
+
+# Speaking pace feedback keyed by (pace differs noticeably, user is slower),
+# as (Streamlit message function, message)
+pace_feedback = {
+    (True, True): ("info", "Your speaking is a bit slower than the native example. That's perfectly fine for learning! As you become more comfortable, you can gradually increase your pace."),
+    (True, False): ("info", "You're speaking a bit faster than the native example. It's great you're confident! Try slowing down slightly to focus on each sound."),
+    (False, True): _PACE_MATCHED,
+    (False, False): _PACE_MATCHED
+}
+
+def normalize_text(text):
+    """
+    Normalize text for word identification.
+
+    Args:
+        text: Text to normalize
+
+    Returns:
+        Lowercase text without punctuation or extra whitespace
+    """
+    return ' '.join(_PUNCTUATION_RE.sub('', text.lower()).split())
+
+def _bullet_list(items, limit=None):
+    """
+    Format items as bullet lines for a single st.markdown call.
+
+    Args:
+        items: Iterable of markdown strings
+        limit: Maximum number of items to show, or None to show all
+
+    Returns:
+        Markdown string with one bullet per line
+    """
+    items = list(items)
+    lines = [f"• {item}" for item in items[:limit]]
+    if limit is not None and len(items) > limit:
+        lines.append(f"• ... and {len(items) - limit} more")
+    # Two trailing spaces force a line break within the paragraph
+    return "  \n".join(lines)
+
+def _audio_duration(audio_path):
+    """
+    Get the duration of an audio file, reading only its header when possible.
+
+    Args:
+        audio_path: Path to the audio file
+
+    Returns:
+        Duration in seconds
+    """
+    try:
+        return sf.info(audio_path).duration
+    except Exception:
+        # Fall back to librosa (imported lazily) for formats soundfile cannot read
+        import librosa
+        return librosa.get_duration(path=audio_path)
 
 def display_pronunciation_feedback(user_recording, reference_recording, phoneme_comparison, recognized_text, expected_text):
     """
@@ -24,23 +88,15 @@ def display_pronunciation_feedback(user_recording, reference_recording, phoneme_
 
     # Extract recording durations for rhythm comparison
     try:
-        user_y, sr = librosa.load(user_recording, sr=16000)
-        ref_y, _ = librosa.load(reference_recording, sr=16000)
-
-        user_duration = librosa.get_duration(y=user_y, sr=sr)
-        ref_duration = librosa.get_duration(y=ref_y, sr=sr)
+        user_duration = _audio_duration(user_recording)
+        ref_duration = _audio_duration(reference_recording)
 
         duration_ratio = min(user_duration, ref_duration) / max(user_duration, ref_duration)
 
         # Speaking pace feedback
         st.markdown("### 🏃‍♂️ Speaking Pace")
-        if duration_ratio < 0.7:
-            if user_duration > ref_duration:
-                st.info("Your speaking is a bit slower than the native example. That's perfectly fine for learning! As you become more comfortable, you can gradually increase your pace.")
-            else:
-                st.info("You're speaking a bit faster than the native example. It's great you're confident! Try slowing down slightly to focus on each sound.")
-        else:
-            st.success("Your speaking pace matches the native example very well! This is excellent for developing natural-sounding Indonesian.")
+        kind, message = pace_feedback[(duration_ratio < 0.7, user_duration > ref_duration)]
+        getattr(st, kind)(message)
     except Exception as e:
         pass  # Silently handle errors
 
@@ -58,15 +114,6 @@ def display_pronunciation_feedback(user_recording, reference_recording, phoneme_
             content_accuracy = compare_text_content(expected_text, recognized_text)
 
         # Normalize texts for word identification only
-        def normalize_text(text):
-            # Convert to lowercase
-            text = text.lower()
-            # Remove punctuation
-            text = re.sub(r'[^\w\s]', '', text)
-            # Remove extra whitespace
-            text = ' '.join(text.split())
-            return text
-
         normalized_expected = normalize_text(expected_text)
         normalized_recognized = normalize_text(recognized_text)
 
@@ -75,11 +122,7 @@ def display_pronunciation_feedback(user_recording, reference_recording, phoneme_
         recognized_words = normalized_recognized.split()
 
         # Find words to focus on
-        missing_words = set()
-
-        for exp_word in expected_words:
-            if exp_word not in recognized_words:
-                missing_words.add(exp_word)
+        missing_words = set(expected_words) - set(recognized_words)
 
         # Display feedback message based on the EXACT same score shown in summary
         if content_accuracy >= 80:
@@ -94,25 +137,24 @@ def display_pronunciation_feedback(user_recording, reference_recording, phoneme_
         if missing_words:
             st.markdown("#### Words to Focus On:")
             st.markdown("These words might need a bit more practice:")
-
-            for word in missing_words:
-                st.markdown(f"• **{word}**")
+            st.markdown(_bullet_list(f"**{word}**" for word in missing_words))
 
             # Keep the helpful tips for pronunciations
             st.markdown("#### Helpful Tips:")
             provided_tips = set()
-            tips_found = False
 
             for word in missing_words:
-                for phoneme, description in pronunciation_challenges.items():
-                    if phoneme in word and phoneme not in provided_tips:
-                        st.info(f"For '{phoneme}' in '{word}': {description}")
+                # Find the challenging sounds in each word with a single scan
+                for phoneme in find_challenge_phonemes(word):
+                    if phoneme not in provided_tips:
+                        st.info(f"For '{phoneme}' in '{word}': {pronunciation_challenges[phoneme]}")
                         provided_tips.add(phoneme)
-                        tips_found = True
                         if len(provided_tips) >= 3:
                             break
+                if len(provided_tips) >= 3:
+                    break
 
-            if not tips_found:
+            if not provided_tips:
                 st.markdown("Try listening to the native audio again and focus on mimicking the sounds closely.")
         else:
             st.success("All words were recognized correctly. Great job!")
@@ -121,14 +163,9 @@ def display_pronunciation_feedback(user_recording, reference_recording, phoneme_
     if phoneme_comparison:
         st.markdown("### 🔊 Sound Accuracy")
 
-        # Count different types of phoneme issues
-        match_count = 0
-        replace_count = 0
-        delete_count = 0
-        insert_count = 0
-
         # Track which specific sounds were problematic for each type of issue
-        problem_phonemes = {}
+        match_count = 0
+        problem_phonemes = defaultdict(list)
         replaced_sounds = []
         deleted_sounds = []
         inserted_sounds = []
@@ -137,27 +174,23 @@ def display_pronunciation_feedback(user_recording, reference_recording, phoneme_
             if match_type == "match" or match_type == "perfect":
                 match_count += 1
             elif match_type == "replace":
-                replace_count += 1
                 replaced_sounds.append((expected, actual))
                 # Track the problematic phoneme with more detail
                 if expected:
-                    if expected in problem_phonemes:
-                        problem_phonemes[expected] = problem_phonemes[expected] + [f"replaced with '{actual}'"]
-                    else:
-                        problem_phonemes[expected] = [f"replaced with '{actual}'"]
+                    problem_phonemes[expected].append(f"replaced with '{actual}'")
             elif match_type == "delete":
-                delete_count += 1
                 deleted_sounds.append(expected)
                 # Track the missing phoneme
                 if expected:
-                    if expected in problem_phonemes:
-                        problem_phonemes[expected] = problem_phonemes[expected] + ["missing"]
-                    else:
-                        problem_phonemes[expected] = ["missing"]
+                    problem_phonemes[expected].append("missing")
             elif match_type == "insert":
-                insert_count += 1
                 inserted_sounds.append(actual)
 
+        # Count different types of phoneme issues
+        replace_count = len(replaced_sounds)
+        delete_count = len(deleted_sounds)
+        insert_count = len(inserted_sounds)
+
         total_phonemes = match_count + replace_count + delete_count
         if total_phonemes > 0:
             accuracy = (match_count / total_phonemes) * 100
@@ -182,56 +215,39 @@ def display_pronunciation_feedback(user_recording, reference_recording, phoneme_
 
             # Show specifically which sounds were replaced
             if replace_count > 0:
-                replacements = []
-                for expected, actual in replaced_sounds:
-                    replacements.append(f"'{expected}' → '{actual}'")
-
+                replacements = [f"'{expected}' → '{actual}'" for expected, actual in replaced_sounds]
                 st.markdown("**Sounds you pronounced differently:**")
-                for i, replacement in enumerate(replacements[:3]):  # Limit to first 3
-                    st.markdown(f"• {replacement}")
-                if len(replacements) > 3:
-                    st.markdown(f"• ... and {len(replacements) - 3} more")
+                st.markdown(_bullet_list(replacements, limit=3))
 
             # Show specifically which sounds were missing
             if delete_count > 0:
                 st.markdown("**Sounds that were missing:**")
-                for i, sound in enumerate(deleted_sounds[:3]):  # Limit to first 3
-                    st.markdown(f"• '{sound}'")
-                if len(deleted_sounds) > 3:
-                    st.markdown(f"• ... and {len(deleted_sounds) - 3} more")
+                st.markdown(_bullet_list([f"'{sound}'" for sound in deleted_sounds], limit=3))
 
             # Show specifically which extra sounds were added
             if insert_count > 0:
                 st.markdown("**Extra sounds you added:**")
-                for i, sound in enumerate(inserted_sounds[:3]):  # Limit to first 3
-                    st.markdown(f"• '{sound}'")
-                if len(inserted_sounds) > 3:
-                    st.markdown(f"• ... and {len(inserted_sounds) - 3} more")
+                st.markdown(_bullet_list([f"'{sound}'" for sound in inserted_sounds], limit=3))
 
         # Show specific sounds to practice with actual examples from the sentence
         if problem_phonemes:
             st.markdown("#### Specific Sounds to Practice:")
 
-            # Sort problems by frequency
-            sorted_problems = sorted(problem_phonemes.items(),
-                                    key=lambda x: len(x[1]),
-                                    reverse=True)
+            # Pick the three most frequent problems without sorting them all
+            # (nlargest keeps the same order as a stable descending sort)
+            top_problems = heapq.nlargest(3, problem_phonemes.items(), key=lambda x: len(x[1]))
 
-            # Find examples of each problematic sound in the original sentence
-            def find_example_words(phoneme, sentence):
-                example_words = []
-                for word in sentence.lower().split():
-                    if phoneme.lower() in word:
-                        example_words.append(word)
-                return example_words[:2]  # Return up to 2 examples
+            # Split the original sentence once for finding example words
+            sentence_words = expected_text.lower().split()
 
             # Display each problematic sound with examples
-            for phoneme, issues in sorted_problems[:3]:  # Limit to top 3 issues
+            for phoneme, issues in top_problems:  # Limit to top 3 issues
                 # Get the description from pronunciation_challenges
                 description = pronunciation_challenges.get(phoneme, "Focus on this sound")
 
                 # Find examples in the original sentence
-                examples = find_example_words(phoneme, expected_text)
+                phoneme_lower = phoneme.lower()
+                examples = list(islice((word for word in sentence_words if phoneme_lower in word), 2))
                 example_text = ""
                 if examples:
                     example_text = f"Examples in this sentence: {', '.join(['**'+word+'**' for word in examples])}"
@@ -3,6 +3,242 @@ Sidebar components for the Indonesian Pronunciation App.
 """
 
 import streamlit as st
+import textwrap
+from functools import lru_cache
+from app.data.gcs import partition_by_difficulty
+from app.interface.audio import list_audio_devices, refresh_audio_devices
+
+# Difficulty levels in the order they are offered
+DIFFICULTY_LEVELS = ("easy", "medium", "difficult")
+
+# Phoneme recognition models offered in the sidebar
+PHONEME_MODELS = ("cahya-indonesian", "wav2vec2-lv-60", "wav2vec2-xlsr-53")
+
+# Speech recognition models offered in the sidebar
+STT_MODELS = ("whisper", "google")
+
+# Whisper model sizes, from fastest to most accurate
+WHISPER_SIZES = ("tiny", "base", "small", "medium", "large")
+
+# Default recording duration in seconds for each difficulty level
+DURATION_MAP = {
+    "easy": 2,
+    "medium": 3,
+    "difficult": 4
+}
+
+# Help text for the recording duration slider for each difficulty level
+SLIDER_HELP = {
+    level: f"Default duration for {level} difficulty is {DURATION_MAP[level]} seconds"
+    for level in DIFFICULTY_LEVELS
+}
+
+# Explanatory note about the duration defaults
+DURATION_CAPTION = """
+Duration settings by difficulty:
+• Easy: 2 seconds
+• Medium: 3 seconds
+• Difficult: 4 seconds
+"""
+
+# Descriptions of the phoneme recognition models
+phoneme_descriptions = {
+    "cahya-indonesian": """
+    **Phoneme Recognition: Cahya Indonesian**
+
+    This model specializes in Indonesian language sounds. It analyzes your speech
+    to identify how closely your pronunciation matches native Indonesian sounds,
+    with particular attention to unique Indonesian phonemes.
+    """,
+
+    "wav2vec2-lv-60": """
+    **Phoneme Recognition: Wav2vec2 LV-60**
+
+    This versatile model recognizes speech sounds across many languages. It compares
+    your pronunciation to standard Indonesian sound patterns and helps identify
+    where your pronunciation might differ from native speakers.
+    """,
+
+    "wav2vec2-xlsr-53": """
+    **Phoneme Recognition: Wav2vec2 XLSR-53**
+
+    This cross-language model is designed to understand speech across multiple
+    languages. It analyzes the phonetic components of your speech to identify how
+    closely your pronunciation matches the expected Indonesian sounds.
+    """
+}
+
+# Descriptions of the Whisper model sizes
+whisper_descriptions = {
+    "tiny": """
+    **Speech Recognition: Whisper (Tiny)**
+
+    This lightweight model converts your speech to text quickly. It works best
+    with clear speech in quiet environments and helps check if the words you're
+    saying match the Indonesian text.
+    """,
+
+    "base": """
+    **Speech Recognition: Whisper (Base)**
+
+    This balanced model provides good speech-to-text conversion for most practice
+    situations. It helps identify whether you're saying the correct Indonesian
+    words with reasonable accuracy.
+    """,
+
+    "small": """
+    **Speech Recognition: Whisper (Small)**
+
+    This enhanced model offers improved accuracy in converting your speech to text.
+    It's better at understanding varied pronunciations and can handle some
+    background noise.
+    """,
+
+    "medium": """
+    **Speech Recognition: Whisper (Medium)**
+
+    This advanced model provides high accuracy in speech recognition. It's good at
+    understanding different accents and speaking styles, helping you get more
+    precise feedback on your Indonesian pronunciation.
+    """,
+
+    "large": """
+    **Speech Recognition: Whisper (Large)**
+
+    This comprehensive model offers maximum accuracy in speech recognition. It
+    excels at understanding a wide range of pronunciations and speaking styles,
+    providing highly accurate text conversion of your Indonesian practice.
+    """
+}
+
+# Description of the Google speech recognition service
+GOOGLE_DESCRIPTION = """
+**Speech Recognition: Google**
+
+This cloud-based service converts your speech to text using Google's technology.
+It's particularly good at recognizing clear speech and helps check if the
+Indonesian words you're saying match the expected text.
+"""
+
+# Static text for the About Natify section
+ABOUT_TEXT = """
+Natify helps you learn Indonesian pronunciation through practice and personalized feedback.
+
+**Key Features:**\n
+• Listen to native Indonesian speakers\n
+• Record your own pronunciation attempts\n
+• Get immediate feedback and scoring\n
+• Track your progress over time\n
+• Practice at different difficulty levels\n
+• Use your own custom sentence collections from Google Cloud Storage
+
+Adjust the settings above to customize your learning experience.
+"""
+
+@st.fragment
+def _microphone_selection():
+    """
+    Show the microphone selection widgets.
+
+    This runs as a fragment because the selected device is only read when
+    recording, so changing it doesn't need to rerun the whole app. Must be
+    called inside a `with st.sidebar:` block, since fragments can't write
+    to st.sidebar directly.
+    """
+    # The device list is cached, so offer a way to pick up newly connected microphones
+    if st.button("Refresh microphones"):
+        refresh_audio_devices()
+    input_devices = list_audio_devices()
+
+    if not input_devices:
+        st.warning("No audio input devices detected")
+    else:
+        # Create the device names for the dropdown once per device list
+        # (the cached list is the same object until it is refreshed)
+        cached_devices, device_names = st.session_state.get('_device_names', (None, None))
+        if cached_devices is not input_devices:
+            device_names = tuple(f"{d['name']} ({d['channels']} ch)" for d in input_devices)
+            st.session_state['_device_names'] = (input_devices, device_names)
+
+        # Add a device selection dropdown
+        selected_device_idx = st.selectbox(
+            "Select input microphone:",
+            range(len(device_names)),
+            format_func=device_names.__getitem__
+        )
+
+        # Store the selected device ID in session state when it changes
+        device_id = input_devices[selected_device_idx]['id']
+        if st.session_state.get('input_device_id') != device_id:
+            st.session_state.input_device_id = device_id
+
+        st.info(f"Using microphone: {input_devices[selected_device_idx]['name']}")
+
+def _sync_duration_from_difficulty(difficulty):
+    """
+    Store the selected difficulty and reset the recording duration to its
+    default when the difficulty changes.
+
+    Args:
+        difficulty: Difficulty level selected in the sidebar
+    """
+    if st.session_state.get('current_difficulty') != difficulty:
+        st.session_state.current_difficulty = difficulty
+        st.session_state.recording_duration = DURATION_MAP.get(difficulty, 3)
+
+@lru_cache(maxsize=32)
+def _progress_summary(total_attempts, successful_attempts, difficulty_attempts, difficulty_success):
+    """
+    Format the progress tracking stats.
+
+    Args:
+        total_attempts: Number of attempts
+        successful_attempts: Number of successful attempts
+        difficulty_attempts: Attempts per level, in DIFFICULTY_LEVELS order
+        difficulty_success: Successful attempts per level, in DIFFICULTY_LEVELS order
+
+    Returns:
+        Tuple: (totals markdown, progress percentage, per-difficulty markdown)
+    """
+    progress_percentage = 0
+    if total_attempts > 0:
+        progress_percentage = (successful_attempts / total_attempts) * 100
+
+    totals_text = f"Total Attempts: {total_attempts}  \nSuccessful Attempts: {successful_attempts}"
+
+    difficulty_lines = []
+    for diff, attempts, successes in zip(DIFFICULTY_LEVELS, difficulty_attempts, difficulty_success):
+        if attempts > 0:
+            success_rate = (successes / attempts) * 100
+            difficulty_lines.append(f"{diff.capitalize()}: {success_rate:.1f}% success ({successes}/{attempts})")
+        else:
+            difficulty_lines.append(f"{diff.capitalize()}: No attempts yet")
+
+    return totals_text, int(progress_percentage), "  \n".join(difficulty_lines)
+
+@lru_cache(maxsize=32)
+def _model_info_markdown(model_type, stt_model, whisper_size):
+    """
+    Combine the descriptions of the selected models into one markdown block.
+
+    Args:
+        model_type: Selected phoneme recognition model
+        stt_model: Selected speech recognition model
+        whisper_size: Selected Whisper model size
+
+    Returns:
+        Markdown string with both model descriptions
+    """
+    if stt_model == "whisper":
+        stt_description = whisper_descriptions[whisper_size]
+    else:
+        stt_description = GOOGLE_DESCRIPTION
+
+    # Dedent each description separately since they are indented differently
+    return "\n\n".join(
+        textwrap.dedent(description).strip()
+        for description in (phoneme_descriptions[model_type], stt_description)
+    )
 
 def setup_sidebar():
     """
@@ -19,67 +255,32 @@ def setup_sidebar():
         st.sidebar.subheader("Filter Difficulty")
         selected_difficulty = st.sidebar.radio(
             "Select difficulty level:",
-            ["easy", "medium", "difficult"],
+            DIFFICULTY_LEVELS,
             index=0  # Default to "easy"
         )
 
-        # Filter DataFrame by selected difficulty
+        # Look up the rows for the selected difficulty from the partitions made at load time
         # But keep the original_sentences_df intact
-        filtered_df = st.session_state.original_sentences_df.copy()
-        filtered_df = filtered_df[filtered_df['difficulty'] == selected_difficulty]
-
-        # Map difficulty to duration
-        duration_map = {
-            "easy": 2,
-            "medium": 3,
-            "difficult": 4
-        }
-
-        # Update session state values
-        st.session_state.current_difficulty = selected_difficulty
-        st.session_state.recording_duration = duration_map.get(selected_difficulty, 3)
-
-        # Only update the filtered_sentences_df, not the original
-        st.session_state.filtered_sentences_df = filtered_df
+        if st.session_state.difficulty_partitions is None:
+            st.session_state.difficulty_partitions = partition_by_difficulty(
+                st.session_state.original_sentences_df
+            )
+        filtered_df = st.session_state.difficulty_partitions[selected_difficulty]
+
+        # The filtered rows aren't stored in the session; the main page reads
+        # them from the partitions through session_state.get_filtered_sentences()
         st.sidebar.info(f"Showing {len(filtered_df)} sentences with {selected_difficulty} difficulty")
 
     # If no DataFrame is loaded, show built-in difficulty selection
     else:
         # Show the difficulty selection only when using built-in sentences
-        difficulty = st.sidebar.radio("Choose Difficulty Level (for built-in sentences):",
-                                     ["easy", "medium", "difficult"])
-
-        # Update current_difficulty immediately when the user changes it in the sidebar
-        if 'current_difficulty' not in st.session_state or st.session_state.current_difficulty != difficulty:
-            st.session_state.current_difficulty = difficulty
-
-            # Update recording duration based on new difficulty
-            duration_map = {
-                "easy": 2,
-                "medium": 3,
-                "difficult": 4
-            }
-            st.session_state.recording_duration = duration_map.get(difficulty, 3)
+        selected_difficulty = st.sidebar.radio("Choose Difficulty Level (for built-in sentences):",
+                                              DIFFICULTY_LEVELS)
 
         st.sidebar.markdown("---")  # Add separator for visual clarity
 
-    # Set a default difficulty level that will be used only as fallback
-    difficulty = "medium"
-
-    # Initialize current difficulty if not already set
-    if 'current_difficulty' not in st.session_state:
-        st.session_state.current_difficulty = "medium"  # Default to medium if not set
-
-    # Map difficulty to duration
-    duration_map = {
-        "easy": 2,
-        "medium": 3,
-        "difficult": 4
-    }
-
-    # Use session state for recording duration, with difficulty-based default if not set
-    if 'recording_duration' not in st.session_state:
-        st.session_state.recording_duration = duration_map.get(st.session_state.current_difficulty, 3)
+    # Update current_difficulty immediately when the user changes it in the sidebar
+    _sync_duration_from_difficulty(selected_difficulty)
 
     # Display the recording duration slider with current session state value
     recording_duration = st.sidebar.slider(
@@ -87,7 +288,7 @@ def setup_sidebar():
         min_value=2,
         max_value=6,
         value=st.session_state.recording_duration,
-        help=f"Default duration for {st.session_state.current_difficulty} difficulty is {duration_map.get(st.session_state.current_difficulty, 3)} seconds"
+        help=SLIDER_HELP[st.session_state.current_difficulty]
     )
 
     # Update session state if slider value changes
@@ -95,18 +296,13 @@ def setup_sidebar():
         st.session_state.recording_duration = recording_duration
 
     # Add an explanatory note about duration defaults
-    st.sidebar.caption(f"""
-    Duration settings by difficulty:
-    • Easy: 2 seconds
-    • Medium: 3 seconds
-    • Difficult: 4 seconds
-    """)
+    st.sidebar.caption(DURATION_CAPTION)
 
     # Model selection for phoneme recognition
     st.sidebar.subheader("Phoneme Recognition Model")
     model_type = st.sidebar.radio(
         "Select Phoneme Recognition Model:",
-        ["cahya-indonesian", "wav2vec2-lv-60", "wav2vec2-xlsr-53"]
+        PHONEME_MODELS
     )
 
     if model_type != st.session_state.model_type:
@@ -116,24 +312,26 @@ def setup_sidebar():
     st.sidebar.subheader("Speech Recognition Model")
     stt_model = st.sidebar.radio(
         "Select Speech Recognition Model:",
-        ["whisper", "google"]
+        STT_MODELS
     )
 
     if stt_model != st.session_state.stt_model:
         st.session_state.stt_model = stt_model
 
     # Whisper model size selection (if Whisper is selected)
+    whisper_size = st.session_state.get('whisper_size', 'base')
     if stt_model == "whisper":
         show_whisper_options = st.sidebar.checkbox("Show Whisper Model Options", value=False)
 
         if show_whisper_options:
-            whisper_size = st.sidebar.select_slider(
+            selected_size = st.sidebar.select_slider(
                 "Whisper Model Size:",
-                options=["tiny", "base", "small", "medium", "large"],
-                value=st.session_state.get('whisper_size', 'base')
+                options=WHISPER_SIZES,
+                value=whisper_size
             )
 
-            if 'whisper_size' not in st.session_state or whisper_size != st.session_state.whisper_size:
+            if 'whisper_size' not in st.session_state or selected_size != whisper_size:
+                whisper_size = selected_size
                 st.session_state.whisper_size = whisper_size
                 # Clear the model to force reload with new size
                 st.session_state.whisper_model = None
@@ -142,163 +340,46 @@ def setup_sidebar():
     st.sidebar.markdown("---")
     st.sidebar.subheader("Microphone Selection")
 
-    from app.interface.audio import list_audio_devices
-    input_devices = list_audio_devices()
-
-    if not input_devices:
-        st.sidebar.warning("No audio input devices detected")
-    else:
-        # Create a list of device names for the dropdown
-        device_names = [f"{d['name']} ({d['channels']} ch)" for d in input_devices]
-
-        # Add a device selection dropdown
-        selected_device_idx = st.sidebar.selectbox(
-            "Select input microphone:",
-            range(len(device_names)),
-            format_func=lambda i: device_names[i]
-        )
-
-        # Store the selected device ID in session state
-        st.session_state.input_device_id = input_devices[selected_device_idx]['id']
-
-        st.sidebar.info(f"Using microphone: {input_devices[selected_device_idx]['name']}")
+    with st.sidebar:
+        _microphone_selection()
 
     # Display progress tracking stats
     st.sidebar.markdown("---")
     st.sidebar.subheader("Progress Tracking")
 
-    # Display stats
-    progress_percentage = 0
-    if st.session_state.total_attempts > 0:
-        progress_percentage = (st.session_state.successful_attempts / st.session_state.total_attempts) * 100
+    # Display stats, reusing the formatted text until an attempt is recorded
+    totals_text, progress_percentage, difficulty_text = _progress_summary(
+        st.session_state.total_attempts,
+        st.session_state.successful_attempts,
+        tuple(st.session_state.difficulty_attempts[diff] for diff in DIFFICULTY_LEVELS),
+        tuple(st.session_state.difficulty_success[diff] for diff in DIFFICULTY_LEVELS)
+    )
 
-    st.sidebar.write(f"Total Attempts: {st.session_state.total_attempts}")
-    st.sidebar.write(f"Successful Attempts: {st.session_state.successful_attempts}")
-    st.sidebar.progress(int(progress_percentage))
+    st.sidebar.markdown(totals_text)
+    st.sidebar.progress(progress_percentage)
 
     # Display difficulty-specific stats
     st.sidebar.subheader("Performance by Difficulty")
-    for diff in ["easy", "medium", "difficult"]:
-        attempts = st.session_state.difficulty_attempts[diff]
-        if attempts > 0:
-            success_rate = (st.session_state.difficulty_success[diff] / attempts) * 100
-            st.sidebar.write(f"{diff.capitalize()}: {success_rate:.1f}% success ({st.session_state.difficulty_success[diff]}/{attempts})")
-        else:
-            st.sidebar.write(f"{diff.capitalize()}: No attempts yet")
+    st.sidebar.markdown(difficulty_text)
 
     # Model Information section with dynamic content
     st.sidebar.markdown("---")
     st.sidebar.subheader("Model Information")
 
-    # Create dynamic descriptions for phoneme recognition models
-    phoneme_descriptions = {
-        "cahya-indonesian": """
-        **Phoneme Recognition: Cahya Indonesian**
-
-        This model specializes in Indonesian language sounds. It analyzes your speech
-        to identify how closely your pronunciation matches native Indonesian sounds,
-        with particular attention to unique Indonesian phonemes.
-        """,
-
-        "wav2vec2-lv-60": """
-        **Phoneme Recognition: Wav2vec2 LV-60**
-
-        This versatile model recognizes speech sounds across many languages. It compares
-        your pronunciation to standard Indonesian sound patterns and helps identify
-        where your pronunciation might differ from native speakers.
-        """,
-
-        "wav2vec2-xlsr-53": """
-        **Phoneme Recognition: Wav2vec2 XLSR-53**
-
-        This cross-language model is designed to understand speech across multiple
-        languages. It analyzes the phonetic components of your speech to identify how
-        closely your pronunciation matches the expected Indonesian sounds.
-        """
-    }
-
-    # Create dynamic descriptions for speech recognition models
-    whisper_descriptions = {
-        "tiny": """
-        **Speech Recognition: Whisper (Tiny)**
-
-        This lightweight model converts your speech to text quickly. It works best
-        with clear speech in quiet environments and helps check if the words you're
-        saying match the Indonesian text.
-        """,
-
-        "base": """
-        **Speech Recognition: Whisper (Base)**
-
-        This balanced model provides good speech-to-text conversion for most practice
-        situations. It helps identify whether you're saying the correct Indonesian
-        words with reasonable accuracy.
-        """,
-
-        "small": """
-        **Speech Recognition: Whisper (Small)**
-
-        This enhanced model offers improved accuracy in converting your speech to text.
-        It's better at understanding varied pronunciations and can handle some
-        background noise.
-        """,
-
-        "medium": """
-        **Speech Recognition: Whisper (Medium)**
-
-        This advanced model provides high accuracy in speech recognition. It's good at
-        understanding different accents and speaking styles, helping you get more
-        precise feedback on your Indonesian pronunciation.
-        """,
-
-        "large": """
-        **Speech Recognition: Whisper (Large)**
-
-        This comprehensive model offers maximum accuracy in speech recognition. It
-        excels at understanding a wide range of pronunciations and speaking styles,
-        providing highly accurate text conversion of your Indonesian practice.
-        """
-    }
-
-    google_description = """
-    **Speech Recognition: Google**
-
-    This cloud-based service converts your speech to text using Google's technology.
-    It's particularly good at recognizing clear speech and helps check if the
-    Indonesian words you're saying match the expected text.
-    """
-
-    # Display the appropriate phoneme model description
-    st.sidebar.markdown(phoneme_descriptions[st.session_state.model_type])
-
-    # Display the appropriate speech recognition model description
-    if st.session_state.stt_model == "whisper":
-        whisper_size = st.session_state.get('whisper_size', 'base')
-        st.sidebar.markdown(whisper_descriptions[whisper_size])
-    else:
-        st.sidebar.markdown(google_description)
+    # Display the appropriate phoneme and speech recognition model descriptions
+    st.sidebar.markdown(_model_info_markdown(
+        st.session_state.model_type,
+        st.session_state.stt_model,
+        whisper_size
+    ))
 
     # Simplified About This App section (static content)
     st.sidebar.markdown("---")
     st.sidebar.subheader("About Natify")
 
-    about_text = """
-    Natify helps you learn Indonesian pronunciation through practice and personalized feedback.
-
-    **Key Features:**\n
-    • Listen to native Indonesian speakers\n
-    • Record your own pronunciation attempts\n
-    • Get immediate feedback and scoring\n
-    • Track your progress over time\n
-    • Practice at different difficulty levels\n
-    • Use your own custom sentence collections from Google Cloud Storage
-
-    Adjust the settings above to customize your learning experience.
-    """
-
-    st.sidebar.info(about_text)
+    st.sidebar.info(ABOUT_TEXT)
 
     # Add a small attribution/version
     st.sidebar.caption("Natify - Your Indonesian Pronunciation Coach")
 
-    return model_type, stt_model, recording_duration, difficulty
+    return model_type, stt_model, recording_duration, selected_difficulty
@@ -7,55 +7,55 @@ Cleaner UI with changes of scoring calculation.
 
 import sys
 import os
+import logging
 
-# Print the Python path to help with debugging
-print("Python path:")
-for p in sys.path:
-    print(f"  {p}")
-
-# Print current directory
-print(f"Current directory: {os.getcwd()}")
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
 
 # Add the project root to the path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-sys.path.insert(0, project_root)
-print(f"Added to path: {project_root}")
-
-# Additional debugging
-print(f"File exists check - sidebar.py: {os.path.exists(os.path.join(os.path.dirname(__file__), 'interface', 'sidebar.py'))}")
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# Path debugging, only when NATIFY_DEBUG is set since this runs on every rerun
+if os.environ.get("NATIFY_DEBUG"):
+    logger.setLevel(logging.DEBUG)
+    for p in sys.path:
+        logger.debug("Python path: %s", p)
+    logger.debug("Current directory: %s", os.getcwd())
+    logger.debug("Added to path: %s", project_root)
+    logger.debug("File exists check - sidebar.py: %s",
+                 os.path.exists(os.path.join(os.path.dirname(__file__), 'interface', 'sidebar.py')))
 
 import streamlit as st
 import json
-from google.oauth2 import service_account
-from google.cloud import storage
 import warnings
+from concurrent.futures import ThreadPoolExecutor, wait
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 warnings.filterwarnings("ignore")
 
 # Import app modules
-from app.interface.sidebar import setup_sidebar
+from app.interface.sidebar import setup_sidebar, DURATION_MAP
 from app.interface.feedback import display_pronunciation_feedback
 from app.interface.audio import record_audio
-from app.ml_logic.models import load_wav2vec2_model, load_whisper_model, load_epitran
+from app.ml_logic.models import load_wav2vec2_model, load_whisper_model, load_epitran, start_model_warmup
 from app.ml_logic.phonemes import ensure_consistent_phoneme_extraction, compare_phonemes, text_to_phonemes
 from app.ml_logic.speech import recognize_speech
-from app.data.gcs import initialize_gcs_client, load_sentences_dataframe_from_gcs
+from app.data.gcs import get_gcs_client, initialize_gcs_client, load_sentences_dataframe_from_gcs, partition_by_difficulty
 from app.data.sentences import get_audio_for_sentence, setup_common_voice_data
 from app.utils.audio_processing import compare_acoustic_features
 from app.utils.text_processing import compare_text_content
 from app.utils.translations import translate_text
 import app.utils.session_state as session_state
 
-import random
+import numpy as np
 
 # Set page configuration
 st.set_page_config(page_title="Natify: Your Indonesian Pronunciation Coach", page_icon="🇮🇩", layout="wide")
 
-# Create API client for Google Cloud
+# Create API client for Google Cloud (shared across sessions)
 try:
-    credentials = service_account.Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"]
-    )
-    client = storage.Client(credentials=credentials)
+    client = get_gcs_client()
     st.success("Connected to Google Cloud Storage successfully")
 except Exception as e:
     st.error(f"Failed to connect to Google Cloud: {e}")
@@ -65,14 +65,139 @@ except Exception as e:
 GCS_BUCKET_NAME = "natify"  # Replace with your actual bucket name
 GCS_TSV_PATH = "final_audio/filtered_results.tsv"  # Replace with your actual TSV file path
 
+# Hugging Face model names for each phoneme model option
+wav2vec2_model_names = {
+    "cahya-indonesian": "cahya/wav2vec2-large-xlsr-indonesian",
+    "wav2vec2-lv-60": "facebook/wav2vec2-lv-60-espeak-cv-ft",
+    "wav2vec2-xlsr-53": "facebook/wav2vec2-large-xlsr-53"
+}
+DEFAULT_WAV2VEC2_MODEL = wav2vec2_model_names["wav2vec2-xlsr-53"]
+
 # Initialize session states
 session_state.initialize_session_state(GCS_BUCKET_NAME, GCS_TSV_PATH)
 
+def analyze_phonemes_and_acoustics(reference_path, user_path, model, processor, feature_extractor, recognized_phonemes=None):
+    """
+    Compare the phonemes of both recordings and then their acoustic features.
+
+    Args:
+        reference_path: Path to reference audio
+        user_path: Path to user's recorded audio
+        model, processor, feature_extractor: Model components for wav2vec2
+        recognized_phonemes: Previously recognized phonemes, used if the model is not loaded
+
+    Returns:
+        Dictionary of session state updates
+    """
+    updates = {}
+
+    # Extract phonemes using wav2vec2 if models are loaded
+    if model and processor:
+        # Always extract phonemes from audio for both recordings using the same method
+        reference_phonemes, recognized_phonemes = ensure_consistent_phoneme_extraction(
+            reference_path,
+            user_path,
+            model, processor, feature_extractor
+        )
+
+        # Compare phonemes (now both derived from audio, not text)
+        phoneme_score, comparison = compare_phonemes(
+            reference_phonemes,
+            recognized_phonemes
+        )
+
+        # Store both phoneme sets and the comparison
+        updates.update({
+            "current_phonemes": reference_phonemes,
+            "recognized_phonemes": recognized_phonemes,
+            "phoneme_score": phoneme_score,
+            "phoneme_comparison": comparison
+        })
+
+    # Get acoustic score
+    updates["acoustic_score"] = compare_acoustic_features(
+        reference_path,
+        user_path,
+        recognized_phonemes  # Pass recognized phonemes to the function
+    )
+    return updates
+
+def analyze_speech_content(user_path, sentence, stt_model):
+    """
+    Recognize the user's speech and compare it with the sentence text.
+
+    Args:
+        user_path: Path to user's recorded audio
+        sentence: Sentence the user was asked to pronounce
+        stt_model: Speech recognition model to use
+
+    Returns:
+        Dictionary of session state updates
+    """
+    # Perform speech recognition for content comparison using selected model
+    recognized_text = recognize_speech(
+        user_path,
+        language='id',
+        stt_model=stt_model
+    )
+
+    # Get content score
+    content_score = compare_text_content(sentence, recognized_text)
+    return {"recognized_text": recognized_text, "content_score": content_score}
+
+def prepare_sentence_state(sentence, translation, sentence_difficulty, epi, common_voice_data):
+    """
+    Build the session state updates for a newly selected sentence.
+
+    Args:
+        sentence: Selected sentence
+        translation: English translation of the sentence
+        sentence_difficulty: Difficulty level of the sentence
+        epi: Epitran instance (or None)
+        common_voice_data: The Common Voice dataset
+
+    Returns:
+        Dictionary of session state updates
+    """
+    # Generate phonemes for the sentence, used for audio comparison and for
+    # display to the user before recording
+    if epi and sentence:
+        phonemes = text_to_phonemes(sentence, epi)
+    else:
+        phonemes = "Phoneme conversion not available"
+
+    # Get audio file path from GCS, falling back to TTS
+    audio_path = get_audio_for_sentence(
+        sentence,
+        common_voice_data,
+        bucket_name=st.session_state.gcs_bucket_name,
+        fallback_to_tts=True
+    )
+
+    return {
+        "current_sentence": sentence,
+        "current_translation": translation,
+        "current_difficulty": sentence_difficulty,
+        # Update recording duration based on difficulty immediately
+        "recording_duration": DURATION_MAP.get(sentence_difficulty, 3),
+        "current_phonemes": phonemes,
+        "text_phonemes": phonemes,
+        "audio_path": audio_path
+    }
+
 # Main application
 def main():
     # Initialize data
     common_voice_data = setup_common_voice_data()
 
+    # Warm up the models in the background while GCS connects (started once per process)
+    warmup_futures = None
+    if 'warmed' not in st.session_state:
+        warmup_futures = start_model_warmup(
+            wav2vec2_model_names.get(st.session_state.model_type, DEFAULT_WAV2VEC2_MODEL),
+            st.session_state.get('whisper_size', 'base')
+        )
+
     # Initialize GCS connection at startup
     if st.session_state.gcs_client is None:
         with st.spinner("Connecting to Google Cloud Storage..."):
@@ -84,12 +209,26 @@ def main():
                     GCS_BUCKET_NAME,
                     GCS_TSV_PATH
                 )
-                # Initialize both DataFrames to the same value initially
+                # The cached loader already returns a private copy for this session,
+                # so the working DataFrame can share it instead of copying it again
                 if st.session_state.original_sentences_df is not None:
-                    st.session_state.sentences_df = st.session_state.original_sentences_df.copy()
-                    st.session_state.filtered_sentences_df = st.session_state.original_sentences_df.copy()
+                    st.session_state.sentences_df = st.session_state.original_sentences_df
+                    # Split by difficulty once so the sidebar filter is a dict lookup
+                    st.session_state.difficulty_partitions = partition_by_difficulty(
+                        st.session_state.original_sentences_df
+                    )
                     st.success(f"Successfully loaded {len(st.session_state.original_sentences_df)} sentences from GCS")
 
+    if warmup_futures is not None:
+        with st.spinner("Loading models..."):
+            wait(warmup_futures)
+        failures = [future.exception() for future in warmup_futures if future.exception() is not None]
+        if failures:
+            # Let the next session retry instead of reusing the failed warm-up
+            start_model_warmup.clear()
+            st.warning(f"Model warm-up failed, models will load on first use: {failures[0]}")
+        st.session_state.warmed = True
+
     # UI Components
     st.title("🇮🇩 Natify: Your Indonesian Pronunciation Coach")
     st.markdown("Practice your Indonesian pronunciation with phoneme-level analysis!")
@@ -98,13 +237,7 @@ def main():
     model_type, stt_model, recording_duration, difficulty = setup_sidebar()
 
     # Load the selected model
-    if model_type == "cahya-indonesian":
-        model_name = "cahya/wav2vec2-large-xlsr-indonesian"
-    elif model_type == "wav2vec2-lv-60":
-        model_name = "facebook/wav2vec2-lv-60-espeak-cv-ft"
-    else:
-        model_name = "facebook/wav2vec2-large-xlsr-53"
-
+    model_name = wav2vec2_model_names.get(model_type, DEFAULT_WAV2VEC2_MODEL)
     model, processor, feature_extractor = load_wav2vec2_model(model_name)
 
     # Load Epitran for text-to-phoneme conversion
@@ -116,101 +249,45 @@ def main():
     with col1:
         # Generate new sentence button
         if st.button("Get New Sentence"):
-            if st.session_state.filtered_sentences_df is not None and not st.session_state.filtered_sentences_df.empty:
-                # Select a random sentence from the filtered DataFrame
-                random_idx = random.randint(0, len(st.session_state.filtered_sentences_df) - 1)
-                sentence_row = st.session_state.filtered_sentences_df.iloc[random_idx]
+            filtered_sentences_df = session_state.get_filtered_sentences()
+            rng = st.session_state.setdefault('rng', np.random.default_rng())
+            if filtered_sentences_df is not None and not filtered_sentences_df.empty:
+                # Select a random sentence from the filtered DataFrame, reading single
+                # cells by position instead of building a Series for the whole row
+                position = rng.integers(len(filtered_sentences_df))
+                columns = filtered_sentences_df.columns
 
-                st.session_state.current_sentence = sentence_row['sentence']
+                sentence = filtered_sentences_df['sentence'].iat[position]
 
                 # Get translation if available or automatically translate it
-                if 'translation' in sentence_row and sentence_row['translation'] != "Translation not available":
-                    st.session_state.current_translation = sentence_row['translation']
-                else:
+                translation = filtered_sentences_df['translation'].iat[position] if 'translation' in columns else None
+                if translation is None or translation == "Translation not available":
                     # Automatically translate without requiring user to press a button
                     with st.spinner("Translating..."):
-                        translation = translate_text(st.session_state.current_sentence)
-                        st.session_state.current_translation = translation
+                        translation = translate_text(sentence)
 
-                # Determine and store current difficulty for the selected sentence
-                if 'difficulty' in sentence_row:
-                    st.session_state.current_difficulty = sentence_row['difficulty']
+                # Determine the difficulty for the selected sentence
+                if 'difficulty' in columns:
+                    sentence_difficulty = filtered_sentences_df['difficulty'].iat[position]
                 else:
                     # Default to medium if not found
-                    st.session_state.current_difficulty = "medium"
-
-                # Update recording duration based on difficulty immediately
-                duration_map = {
-                    "easy": 2,
-                    "medium": 3,
-                    "difficult": 4
-                }
-                st.session_state.recording_duration = duration_map.get(st.session_state.current_difficulty, 3)
-
-                # Generate phonemes for the sentence (used for audio comparison)
-                if epi:
-                    st.session_state.current_phonemes = text_to_phonemes(st.session_state.current_sentence, epi)
-                else:
-                    st.session_state.current_phonemes = "Phoneme conversion not available"
-
-                # Generate text-based phonemes for display to user before recording
-                if epi and st.session_state.current_sentence:
-                    st.session_state.text_phonemes = text_to_phonemes(st.session_state.current_sentence, epi)
-                else:
-                    st.session_state.text_phonemes = "Phoneme conversion not available"
-
-                # Get audio file path from GCS with explicit bucket name
-                audio_path = get_audio_for_sentence(
-                    st.session_state.current_sentence,
-                    st.session_state.sentences_df,
-                    bucket_name=st.session_state.gcs_bucket_name,
-                    fallback_to_tts=True
-                )
-
-                # Store the path and show audio source
-                st.session_state.audio_path = audio_path
+                    sentence_difficulty = "medium"
             else:
                 # Use the default sentences database from sentences.py
-                from app.data.sentences import sentences_db
+                from app.data.sentences import get_sentences
 
                 # Select a random sentence from the chosen difficulty
-                sentence_data = random.choice(sentences_db[difficulty])
-                st.session_state.current_sentence = sentence_data["sentence"]
-                st.session_state.current_translation = sentence_data["translation"]
-
-                # Store the difficulty for recording duration defaults
-                st.session_state.current_difficulty = difficulty
-
-                # Update recording duration based on difficulty immediately
-                duration_map = {
-                    "easy": 2,
-                    "medium": 3,
-                    "difficult": 4
-                }
-                st.session_state.recording_duration = duration_map.get(difficulty, 3)
-
-                # Generate phonemes for the sentence (used for audio comparison)
-                if epi:
-                    st.session_state.current_phonemes = text_to_phonemes(st.session_state.current_sentence, epi)
-                else:
-                    st.session_state.current_phonemes = "Phoneme conversion not available"
+                sentence_data = get_sentences(difficulty).sample(n=1, random_state=rng).iloc[0]
+                sentence = sentence_data["sentence"]
+                translation = sentence_data["translation"]
 
-                # Generate text-based phonemes for user display
-                if epi and st.session_state.current_sentence:
-                    st.session_state.text_phonemes = text_to_phonemes(st.session_state.current_sentence, epi)
-                else:
-                    st.session_state.text_phonemes = "Phoneme conversion not available"
-
-                # Get audio file path from GCS or fallback to built-in
-                audio_path = get_audio_for_sentence(
-                    st.session_state.current_sentence,
-                    common_voice_data,
-                    bucket_name=st.session_state.gcs_bucket_name,
-                    fallback_to_tts=True
-                )
+                # Use the selected difficulty for recording duration defaults
+                sentence_difficulty = difficulty
 
-            # Store the path
-            st.session_state.audio_path = audio_path
+            # Store the new sentence in one session state update
+            st.session_state.update(
+                prepare_sentence_state(sentence, translation, sentence_difficulty, epi, common_voice_data)
+            )
 
             # Reset recording and score
             session_state.reset_session_scores()
@@ -257,67 +334,44 @@ def main():
                 # Process recording if models are loaded
                 if st.session_state.audio_path and st.session_state.user_recording:
                     with st.spinner('Analyzing your pronunciation...'):
-                        # Extract phonemes using wav2vec2 if models are loaded
-                        if model and processor:
-                            # Always extract phonemes from audio for both recordings using the same method
-                            reference_phonemes, recognized_phonemes = ensure_consistent_phoneme_extraction(
+                        # Phoneme + acoustic scoring and speech recognition + content scoring
+                        # use different models, so run the two chains side by side
+                        ctx = get_script_run_ctx()
+                        with ThreadPoolExecutor(max_workers=2, initializer=add_script_run_ctx,
+                                                initargs=(None, ctx)) as executor:
+                            phoneme_future = executor.submit(
+                                analyze_phonemes_and_acoustics,
                                 st.session_state.audio_path,
-                                st.session_state.user_recording,
-                                model, processor, feature_extractor
+                                user_audio_path,
+                                model, processor, feature_extractor,
+                                st.session_state.recognized_phonemes
                             )
-
-                            # Store both phoneme sets
-                            st.session_state.current_phonemes = reference_phonemes
-                            st.session_state.recognized_phonemes = recognized_phonemes
-
-                            # Compare phonemes (now both derived from audio, not text)
-                            phoneme_score, comparison = compare_phonemes(
-                                reference_phonemes,
-                                recognized_phonemes
+                            speech_future = executor.submit(
+                                analyze_speech_content,
+                                user_audio_path,
+                                st.session_state.current_sentence,
+                                st.session_state.stt_model
                             )
-                            st.session_state.phoneme_score = phoneme_score
-                            st.session_state.phoneme_comparison = comparison
+                            # Collect the results and store them in one session state update
+                            updates = phoneme_future.result()
+                            updates.update(speech_future.result())
 
-                            # Still keep text-based phonemes for display purposes
-                            if epi and st.session_state.current_sentence:
-                                st.session_state.text_phonemes = text_to_phonemes(st.session_state.current_sentence, epi)
-                            else:
-                                st.session_state.text_phonemes = "Text-based phoneme conversion not available"
-
-                        # Get acoustic score
-                        acoustic_score = compare_acoustic_features(
-                            st.session_state.audio_path,
-                            st.session_state.user_recording,
-                            st.session_state.recognized_phonemes  # Pass recognized phonemes to the function
-                        )
-                        st.session_state.acoustic_score = acoustic_score
-
-                        # Perform speech recognition for content comparison using selected model
-                        recognized_text = recognize_speech(
-                            st.session_state.user_recording,
-                            language='id',
-                            stt_model=st.session_state.stt_model
-                        )
-                        st.session_state.recognized_text = recognized_text
-
-                        # Get content score
-                        content_score = compare_text_content(
-                            st.session_state.current_sentence,
-                            recognized_text
-                        )
-                        st.session_state.content_score = content_score
+                        phoneme_score = updates.get('phoneme_score', st.session_state.phoneme_score)
+                        acoustic_score = updates['acoustic_score']
+                        content_score = updates['content_score']
 
                         # Calculate final score - weighted combination
-                        if st.session_state.phoneme_score is not None:
+                        if phoneme_score is not None:
                             final_score = (
                                 (acoustic_score * 0.3) +
                                 (content_score * 0.3) +
-                                (st.session_state.phoneme_score * 0.4)
+                                (phoneme_score * 0.4)
                             )
                         else:
                             final_score = (acoustic_score * 0.4) + (content_score * 0.6)
 
-                        st.session_state.score = final_score
+                        updates['score'] = final_score
+                        st.session_state.update(updates)
 
                         # Update progress tracking - only count each new recording once
                         if st.session_state.score != st.session_state.last_recorded_score:
@@ -326,20 +380,13 @@ def main():
                             # Determine difficulty
                             current_difficulty = "easy"
                             if st.session_state.sentences_df is not None:
-                                # Try to find the sentence in the DataFrame to get its difficulty
-                                sentence_match = st.session_state.sentences_df[
-                                    st.session_state.sentences_df['sentence'] == st.session_state.current_sentence
-                                ]
-                                if not sentence_match.empty and 'difficulty' in sentence_match.columns:
-                                    current_difficulty = sentence_match.iloc[0]['difficulty']
+                                # Look up the sentence's difficulty in the index built at load time
+                                difficulty_index = st.session_state.sentences_df.attrs.get('difficulty_index', {})
+                                if st.session_state.current_sentence in difficulty_index:
+                                    current_difficulty = difficulty_index[st.session_state.current_sentence]
 
                                     # Update recording duration based on sentence difficulty
-                                    duration_map = {
-                                        "easy": 2,
-                                        "medium": 3,
-                                        "difficult": 4
-                                    }
-                                    st.session_state.recording_duration = duration_map.get(current_difficulty, 3)
+                                    st.session_state.recording_duration = DURATION_MAP.get(current_difficulty, 3)
                             else:
                                 # Use the selected difficulty from the sidebar
                                 current_difficulty = difficulty
@@ -3,16 +3,82 @@ Machine learning model loading and management for the Indonesian Pronunciation A
 """
 
 import streamlit as st
-import torch
-from transformers import (
-    Wav2Vec2ForCTC,
-    Wav2Vec2Processor,
-    Wav2Vec2FeatureExtractor,
-    MarianMTModel,
-    MarianTokenizer
-)
-import epitran
-import whisper
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# torch, transformers, faster-whisper and epitran take seconds to import, so they
+# are imported inside the loaders and the page can render before they are needed.
+
+@lru_cache(maxsize=None)
+def _torch():
+    """
+    Import torch and size its thread pools, once per process.
+
+    Returns:
+        The torch module
+    """
+    import torch
+
+    # Give PyTorch half of the cores: faster-whisper runs alongside wav2vec2 during
+    # analysis and uses its own thread pool
+    torch.set_num_threads(max(1, (os.cpu_count() or 2) // 2))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Inter-op threads can only be set before any parallel work has started
+        pass
+    return torch
+
+def _load_ctc_model(model_name):
+    """
+    Load the CTC model, preferring an int8 ONNX Runtime export when one exists.
+
+    Args:
+        model_name: Name or path of the model to load
+
+    Returns:
+        ORTWav2Vec2 or Wav2Vec2ForCTC model
+    """
+    from transformers import Wav2Vec2ForCTC
+    from app.ml_logic.onnx_loader import load_quantized_model
+
+    quantized_model = load_quantized_model(model_name)
+    if quantized_model is not None:
+        return quantized_model
+    return Wav2Vec2ForCTC.from_pretrained(model_name)
+
+def _prepare_for_inference(model):
+    """
+    Put a wav2vec2 model into inference mode for the available device.
+
+    On GPU the weights are moved to CUDA in float16. On CPU the Linear
+    layers are dynamically quantized to int8. Activations stay in FP32
+    and are quantized on the fly, so the CTC output is practically
+    unchanged while the encoder matmuls get much cheaper.
+
+    Args:
+        model: Wav2Vec2ForCTC model loaded with from_pretrained
+
+    Returns:
+        Model ready for inference
+    """
+    torch = _torch()
+
+    # ONNX Runtime models are already quantized and optimized
+    if not isinstance(model, torch.nn.Module):
+        return model
+
+    if torch.cuda.is_available():
+        model = model.to("cuda", dtype=torch.float16)
+    else:
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    model.eval()
+    return model
 
 @st.cache_resource
 def load_wav2vec2_model(model_name):
@@ -26,22 +92,26 @@ def load_wav2vec2_model(model_name):
         Tuple: (model, processor, feature_extractor)
     """
     try:
+        from transformers import Wav2Vec2Processor, Wav2Vec2FeatureExtractor
+
         # For cahya/wav2vec2-large-xlsr-indonesian model
         if "cahya/wav2vec2-large-xlsr-indonesian" in model_name:
             processor = Wav2Vec2Processor.from_pretrained(model_name)
-            model = Wav2Vec2ForCTC.from_pretrained(model_name)
+            model = _load_ctc_model(model_name)
 
             # Store model-specific configuration for extraction
             model.config.model_type = "cahya-indonesian"
+            model = _prepare_for_inference(model)
             return model, processor, None
 
         # For wav2vec2-lv-60-espeak-cv-ft, we need to handle differently
         elif "wav2vec2-lv-60-espeak-cv-ft" in model_name:
             feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
-            model = Wav2Vec2ForCTC.from_pretrained(model_name)
+            model = _load_ctc_model(model_name)
 
             # Store model-specific configuration
             model.config.model_type = "wav2vec2-phoneme"
+            model = _prepare_for_inference(model)
 
             # Create a custom processor with improved handling
             class EnhancedProcessor:
@@ -73,19 +143,21 @@ def load_wav2vec2_model(model_name):
             try:
                 from transformers import AutoProcessor
                 processor = AutoProcessor.from_pretrained(model_name)
-                model = Wav2Vec2ForCTC.from_pretrained(model_name)
+                model = _load_ctc_model(model_name)
 
                 # Store model-specific configuration
                 model.config.model_type = "xlsr-53"
+                model = _prepare_for_inference(model)
 
                 return model, processor, None
             except:
                 # Fallback to feature extractor only
                 feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
-                model = Wav2Vec2ForCTC.from_pretrained(model_name)
+                model = _load_ctc_model(model_name)
 
                 # Store model-specific configuration
                 model.config.model_type = "xlsr-53"
+                model = _prepare_for_inference(model)
 
                 # Create an enhanced processor
                 class EnhancedProcessor:
@@ -108,10 +180,11 @@ def load_wav2vec2_model(model_name):
         # Default approach for other models
         else:
             processor = Wav2Vec2Processor.from_pretrained(model_name)
-            model = Wav2Vec2ForCTC.from_pretrained(model_name)
+            model = _load_ctc_model(model_name)
 
             # Store model-specific configuration
             model.config.model_type = "default"
+            model = _prepare_for_inference(model)
 
             return model, processor, None
 
@@ -122,16 +195,26 @@ def load_wav2vec2_model(model_name):
 @st.cache_resource
 def load_whisper_model(model_size="base"):
     """
-    Load the OpenAI Whisper model for speech recognition.
+    Load a faster-whisper (CTranslate2) model for speech recognition.
+
+    Weights are int8 on both CPU and GPU; activations are float16 on GPU.
 
     Args:
         model_size: Size of the Whisper model (tiny, base, small, medium, large)
 
     Returns:
-        Loaded Whisper model
+        Loaded WhisperModel
     """
     try:
-        model = whisper.load_model(model_size)
+        from faster_whisper import WhisperModel
+
+        use_cuda = _torch().cuda.is_available()
+        model = WhisperModel(
+            model_size,
+            device="cuda" if use_cuda else "cpu",
+            compute_type="int8_float16" if use_cuda else "int8",
+            num_workers=1
+        )
         return model
     except Exception as e:
         st.error(f"Error loading Whisper model: {e}")
@@ -146,9 +229,18 @@ def load_translation_model():
         Tuple of (model, tokenizer)
     """
     try:
+        from transformers import MarianMTModel, MarianTokenizer
+        torch = _torch()
+
         model_name = "Helsinki-NLP/opus-mt-id-en"  # Indonesian to English
         tokenizer = MarianTokenizer.from_pretrained(model_name)
         model = MarianMTModel.from_pretrained(model_name)
+        # MarianMT is a Linear-heavy Transformer, so int8 dynamic quantization helps on CPU
+        if not torch.cuda.is_available():
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        model.eval()
         return model, tokenizer
     except Exception as e:
         st.error(f"Error loading translation model: {e}")
@@ -163,7 +255,64 @@ def load_epitran():
         Epitran instance
     """
     try:
+        import epitran
         return epitran.Epitran('ind-Latn')
     except Exception as e:
         st.error(f"Error loading Epitran: {e}")
         return None
+
+def _warm_up_wav2vec2(model_name):
+    """
+    Load a wav2vec2 model and run one forward pass on a second of silence.
+
+    Args:
+        model_name: Name or path of the model to load
+    """
+    model, _, _ = load_wav2vec2_model(model_name)
+    if model is not None:
+        torch = _torch()
+        with torch.inference_mode():
+            model(torch.zeros(1, 16000, device=model.device, dtype=model.dtype))
+
+def _warm_up_whisper(model_size):
+    """
+    Load a Whisper model and transcribe a second of silence.
+
+    Args:
+        model_size: Size of the Whisper model
+    """
+    model = load_whisper_model(model_size)
+    if model is not None:
+        segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), language='id')
+        # Consume the generator so the decoder actually runs
+        list(segments)
+
+@st.cache_resource(show_spinner=False)
+def start_model_warmup(model_name, whisper_size="base"):
+    """
+    Start loading and warming up the models in background threads, once per process.
+
+    Every session asking for the same models gets the same futures, so only
+    the first visitor pays for the warm-up. The workers run with the starting
+    script's ScriptRunContext, so errors from the cached loaders are shown.
+    The returned futures can be waited on once other startup work, such as
+    connecting to Google Cloud Storage, has finished.
+
+    Args:
+        model_name: Name of the wav2vec2 model to warm up
+        whisper_size: Size of the Whisper model to warm up
+
+    Returns:
+        List of futures, one per warm-up task
+    """
+    ctx = get_script_run_ctx()
+    executor = ThreadPoolExecutor(max_workers=3, initializer=add_script_run_ctx,
+                                  initargs=(None, ctx))
+    futures = [
+        executor.submit(_warm_up_wav2vec2, model_name),
+        executor.submit(_warm_up_whisper, whisper_size),
+        executor.submit(load_epitran)
+    ]
+    # Let the worker threads exit once the submitted tasks are done
+    executor.shutdown(wait=False)
+    return futures
@@ -0,0 +1,138 @@
+"""
+ONNX Runtime int8 wav2vec2 models for the Indonesian Pronunciation App.
+
+A model exported and statically quantized with export_quantized_model is
+picked up automatically by load_wav2vec2_model. onnxruntime and optimum
+are only needed when such a model exists or is being exported, so they
+are imported inside the functions that use them.
+"""
+
+import os
+from types import SimpleNamespace
+import numpy as np
+import torch
+
+# Directory holding exported models, one subdirectory per model name
+ONNX_MODEL_DIR = os.environ.get(
+    "NATIFY_ONNX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "models", "onnx")
+)
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+
+def quantized_model_path(model_name):
+    """
+    Get the path of the int8 ONNX export of a model.
+
+    Args:
+        model_name: Hugging Face name of the wav2vec2 model
+
+    Returns:
+        Path where the quantized model is (or would be) stored
+    """
+    return os.path.join(ONNX_MODEL_DIR, model_name.replace('/', '--'), QUANTIZED_MODEL_FILE)
+
+class ORTWav2Vec2:
+    """
+    wav2vec2 CTC model backed by an ONNX Runtime session.
+
+    Exposes the parts of Wav2Vec2ForCTC used by phoneme extraction:
+    config, device, dtype, calling the model for logits and
+    _get_feat_extract_output_lengths.
+    """
+
+    def __init__(self, onnx_path, config):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.config = config
+        self.device = torch.device("cpu")
+        self.dtype = torch.float32
+
+    def __call__(self, input_values, attention_mask=None):
+        feeds = {"input_values": input_values.numpy()}
+        if attention_mask is not None and "attention_mask" in self.input_names:
+            feeds["attention_mask"] = attention_mask.numpy().astype(np.int64)
+        logits = self.session.run(["logits"], feeds)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+    def _get_feat_extract_output_lengths(self, input_lengths):
+        # Same arithmetic as Wav2Vec2ForCTC: one step per convolutional layer
+        for kernel_size, stride in zip(self.config.conv_kernel, self.config.conv_stride):
+            input_lengths = torch.div(input_lengths - kernel_size, stride, rounding_mode="floor") + 1
+        return input_lengths
+
+def load_quantized_model(model_name):
+    """
+    Load the int8 ONNX export of a model if one exists.
+
+    Args:
+        model_name: Hugging Face name of the wav2vec2 model
+
+    Returns:
+        ORTWav2Vec2 instance, or None if there is no export or onnxruntime is missing
+    """
+    onnx_path = quantized_model_path(model_name)
+    if not os.path.exists(onnx_path):
+        return None
+
+    try:
+        from transformers import AutoConfig
+        return ORTWav2Vec2(onnx_path, AutoConfig.from_pretrained(model_name))
+    except ImportError:
+        return None
+
+def export_quantized_model(model_name, calibration_paths, sample_rate=16000):
+    """
+    Export a wav2vec2 model to ONNX and quantize it to int8 with static QDQ quantization.
+
+    Meant to be run once, offline, for example:
+    python -c "from app.ml_logic.onnx_loader import export_quantized_model; ..."
+
+    Args:
+        model_name: Hugging Face name of the wav2vec2 model
+        calibration_paths: Paths of representative audio clips (about 100) used
+            to calibrate the activation ranges
+        sample_rate: Sample rate the model expects
+
+    Returns:
+        Path to the quantized model
+    """
+    import librosa
+    from optimum.onnxruntime import ORTModelForCTC
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from transformers import Wav2Vec2FeatureExtractor
+
+    output_path = quantized_model_path(model_name)
+    export_dir = os.path.dirname(output_path)
+
+    # Export the FP32 graph
+    ORTModelForCTC.from_pretrained(model_name, export=True).save_pretrained(export_dir)
+
+    feature_extractor = Wav2Vec2FeatureExtractor.from_pretrained(model_name)
+
+    class ClipReader(CalibrationDataReader):
+        """Feed one calibration clip per call, preprocessed like at inference."""
+
+        def __init__(self, paths):
+            self.paths = iter(paths)
+
+        def get_next(self):
+            path = next(self.paths, None)
+            if path is None:
+                return None
+            y, _ = librosa.load(path, sr=sample_rate)
+            inputs = feature_extractor(y, sampling_rate=sample_rate, return_tensors="np")
+            return {"input_values": inputs.input_values.astype(np.float32)}
+
+    quantize_static(
+        os.path.join(export_dir, "model.onnx"),
+        output_path,
+        ClipReader(calibration_paths),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QInt8,
+        weight_type=QuantType.QInt8
+    )
+    return output_path
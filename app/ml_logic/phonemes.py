@@ -3,41 +3,83 @@ Phoneme extraction and comparison for the Indonesian Pronunciation App.
 """
 
 import streamlit as st
-import torch
-import librosa
+import os
 import numpy as np
-from difflib import SequenceMatcher
-import Levenshtein
+from functools import lru_cache
+from rapidfuzz.distance import Levenshtein
 from app.data.phonemes import map_to_standard_indonesian_phonemes, identify_challenges
+from app.utils.audio_processing import load_audio
 
-def extract_phonemes_wav2vec2(audio_path, model, processor, feature_extractor=None, sample_rate=16000):
+# First 100 tokens ~ common phonemes in many languages, used when token ids
+# cannot be decoded by the processor
+ipa_like_phonemes = "abcdefghijklmnopqrstuvwxyzəɪʊɛɔæɑʌɒɨʉɯɤøɵœɶɐɞʏɘɹɾɽɻɺɮɬɡɠɧɦɥɰʎʍɕʑʡʢǀǁǂǃɓɗɓǃǂɠʘ!ʼ,.?-:;()[]{}"
+_ipa_like_array = np.array(list(ipa_like_phonemes))
+
+def _decode_phonemes(predicted_ids, model, processor):
     """
-    Extract phonemes from audio using wav2vec2 model.
+    Turn the predicted token ids of one utterance into standardized phonemes.
 
     Args:
-        audio_path: Path to the audio file
+        predicted_ids: 1-D tensor of predicted token ids
+        model: Wav2vec2 model
+        processor: Wav2vec2 processor
+
+    Returns:
+        String: Extracted phonemes
+    """
+    # For cahya/wav2vec2-large-xlsr-indonesian, we can decode directly
+    if "cahya-indonesian" in str(model.config.model_type):
+        try:
+            transcription = processor.batch_decode(predicted_ids.unsqueeze(0))[0]
+            # Map to standard phonemes
+            return map_to_standard_indonesian_phonemes(transcription)
+        except Exception as e:
+            st.error(f"Error decoding with processor: {e}")
+            # Fall back to the generic approach below
+
+    # Create a simplified phoneme representation
+    # Since direct decoding may not work, we'll map to IPA-like phonemes
+    # Convert each prediction to a character, dropping consecutive repeats
+    ids = predicted_ids.numpy()
+    if len(ids):
+        keep = np.empty(ids.shape, dtype=bool)
+        keep[0] = True
+        np.not_equal(ids[1:], ids[:-1], out=keep[1:])
+        ids = ids[keep]
+
+    # Join into a string, limiting to first 30 characters to avoid noise
+    phoneme_string = ''.join(_ipa_like_array[ids[:30] % len(ipa_like_phonemes)])
+
+    # Map to standard phonemes
+    return map_to_standard_indonesian_phonemes(phoneme_string)
+
+def extract_phonemes_batch(audio_paths, model, processor, feature_extractor=None, sample_rate=16000):
+    """
+    Extract phonemes from several audio files with a single wav2vec2 forward pass.
+
+    The waveforms are padded to the longest one, and each row of the output
+    is cut back to the frames of its own audio before decoding.
+
+    Args:
+        audio_paths: List of paths to audio files
         model: Wav2vec2 model
         processor: Wav2vec2 processor
         feature_extractor: Wav2vec2 feature extractor (optional)
         sample_rate: Sample rate in Hz
 
     Returns:
-        String: Extracted phonemes
+        List of strings: Extracted phonemes for each file
     """
+    # torch is only needed for inference, so it is not imported with the module
+    import torch
+
     try:
-        # Load audio
-        y, sr = librosa.load(audio_path, sr=sample_rate)
-
-        # Process audio with wav2vec2
-        if feature_extractor is not None:
-            # Use the feature extractor directly
-            inputs = feature_extractor(y, sampling_rate=sr, return_tensors="pt")
-        elif hasattr(processor, 'feature_extractor'):
-            # Use the processor's feature extractor
-            inputs = processor(y, sampling_rate=sr, return_tensors="pt")
-        else:
-            # Direct call to processor
-            inputs = processor(y, sampling_rate=sr, return_tensors="pt")
+        # Load audio, reusing earlier decodes (the reference is decoded once per sentence)
+        waveforms = [load_audio(audio_path, sample_rate)[0] for audio_path in audio_paths]
+
+        # Process audio with wav2vec2, using the feature extractor directly if given
+        extractor = feature_extractor if feature_extractor is not None else processor
+        inputs = extractor(waveforms, sampling_rate=sample_rate, return_tensors="pt", padding=True)
 
         # Get input values for the model
         if 'input_values' in inputs:
@@ -46,52 +88,58 @@ def extract_phonemes_wav2vec2(audio_path, model, processor, feature_extractor=No
             # Fall back to assuming the processor returns the input_values directly
             input_values = inputs
 
-        with torch.no_grad():
-            logits = model(input_values).logits
+        # Match the device and precision the model was loaded with
+        input_values = input_values.to(model.device, dtype=model.dtype)
+        model_kwargs = {}
+        if 'attention_mask' in inputs:
+            model_kwargs['attention_mask'] = inputs.attention_mask.to(model.device)
+
+        with torch.inference_mode():
+            logits = model(input_values, **model_kwargs).logits
 
         # Get predicted ids
-        predicted_ids = torch.argmax(logits, dim=-1)
-
-        # For cahya/wav2vec2-large-xlsr-indonesian, we can decode directly
-        if "cahya-indonesian" in str(model.config.model_type):
-            try:
-                transcription = processor.batch_decode(predicted_ids)[0]
-                # Map to standard phonemes
-                return map_to_standard_indonesian_phonemes(transcription)
-            except Exception as e:
-                st.error(f"Error decoding with processor: {e}")
-                # Fall back to the generic approach below
-
-        # Create a simplified phoneme representation
-        # Since direct decoding may not work, we'll map to IPA-like phonemes
-        # First 100 tokens ~ common phonemes in many languages
-        ipa_like_phonemes = "abcdefghijklmnopqrstuvwxyzəɪʊɛɔæɑʌɒɨʉɯɤøɵœɶɐɞʏɘɹɾɽɻɺɮɬɡɠɧɦɥɰʎʍɕʑʡʢǀǁǂǃɓɗɓǃǂɠʘ!ʼ,.?-:;()[]{}"
-
-        # Convert each prediction to a character, but avoid repeats
-        phoneme_list = []
-        prev_id = None
-
-        for id_tensor in predicted_ids[0]:
-            id_val = id_tensor.item()
-            # Skip if it's a repeat
-            if id_val != prev_id:
-                phoneme_index = id_val % len(ipa_like_phonemes)
-                phoneme_list.append(ipa_like_phonemes[phoneme_index])
-                prev_id = id_val
-
-        # Join into a string, limiting to first 30 characters to avoid noise
-        phoneme_string = ''.join(phoneme_list[:30])
-
-        # Map to standard phonemes
-        return map_to_standard_indonesian_phonemes(phoneme_string)
+        predicted_ids = torch.argmax(logits, dim=-1).cpu()
+
+        # Number of output frames that belong to each waveform (the rest is padding)
+        frame_counts = [predicted_ids.shape[1]] * len(waveforms)
+        if len(waveforms) > 1 and hasattr(model, '_get_feat_extract_output_lengths'):
+            frame_counts = model._get_feat_extract_output_lengths(
+                torch.tensor([len(y) for y in waveforms])
+            ).tolist()
+
+        return [
+            _decode_phonemes(ids[:frames], model, processor)
+            for ids, frames in zip(predicted_ids, frame_counts)
+        ]
     except Exception as e:
         st.error(f"Error extracting phonemes: {e}")
-        return ""
+        return [""] * len(audio_paths)
+
+def extract_phonemes_wav2vec2(audio_path, model, processor, feature_extractor=None, sample_rate=16000):
+    """
+    Extract phonemes from audio using wav2vec2 model.
+
+    Args:
+        audio_path: Path to the audio file
+        model: Wav2vec2 model
+        processor: Wav2vec2 processor
+        feature_extractor: Wav2vec2 feature extractor (optional)
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        String: Extracted phonemes
+    """
+    return extract_phonemes_batch([audio_path], model, processor, feature_extractor, sample_rate)[0]
 
 def ensure_consistent_phoneme_extraction(reference_audio_path, user_audio_path, model, processor, feature_extractor=None):
     """
     Ensure both reference and user phonemes are extracted using the same method (audio-based).
 
+    Both recordings go through the model in one batch. The reference
+    phonemes are cached in the session, keyed by path, modification time
+    and model, so retries of the same sentence only encode the user's
+    recording.
+
     Args:
         reference_audio_path: Path to reference audio
         user_audio_path: Path to user's recorded audio
@@ -100,20 +148,47 @@ def ensure_consistent_phoneme_extraction(reference_audio_path, user_audio_path,
     Returns:
         Tuple of (reference_phonemes, user_phonemes)
     """
-    # Always extract phonemes from audio for both reference and user recording
-    reference_phonemes = extract_phonemes_wav2vec2(
-        reference_audio_path, model, processor, feature_extractor
+    # Key on the file's modification time too, so a rewritten reference is re-encoded
+    reference_cache = st.session_state.setdefault('reference_phonemes_cache', {})
+    cache_key = (
+        reference_audio_path,
+        os.stat(reference_audio_path).st_mtime_ns,
+        str(model.config.model_type)
     )
 
-    user_phonemes = extract_phonemes_wav2vec2(
-        user_audio_path, model, processor, feature_extractor
-    )
+    # Always extract phonemes from audio for both reference and user recording
+    if cache_key in reference_cache:
+        reference_phonemes = reference_cache[cache_key]
+        user_phonemes = extract_phonemes_wav2vec2(
+            user_audio_path, model, processor, feature_extractor
+        )
+    else:
+        reference_phonemes, user_phonemes = extract_phonemes_batch(
+            [reference_audio_path, user_audio_path], model, processor, feature_extractor
+        )
+        if reference_phonemes:
+            reference_cache[cache_key] = reference_phonemes
+
+    # Both are already standardized by _decode_phonemes; the mapping is not
+    # idempotent (y -> j -> dʒ), so it must not be applied a second time
+    return reference_phonemes, user_phonemes
 
-    # Ensure both are standardized (though extract_phonemes_wav2vec2 should already do this)
-    reference_phonemes = map_to_standard_indonesian_phonemes(reference_phonemes)
-    user_phonemes = map_to_standard_indonesian_phonemes(user_phonemes)
+@lru_cache(maxsize=4096)
+def _cached_text_phonemes(text, epi):
+    """
+    Transliterate text with Epitran and standardize the phonemes, memoized.
 
-    return reference_phonemes, user_phonemes
+    Epitran instances are hashed by identity, so the cache is tied to the
+    instance returned by load_epitran.
+
+    Args:
+        text: Text to convert to phonemes
+        epi: Epitran instance
+
+    Returns:
+        String: Standardized phonemes
+    """
+    return map_to_standard_indonesian_phonemes(epi.transliterate(text))
 
 def text_to_phonemes(text, epi):
     """
@@ -130,9 +205,8 @@ def text_to_phonemes(text, epi):
         return ""
 
     try:
-        ipa_phonemes = epi.transliterate(text)
-        # Standardize the phoneme representation
-        return map_to_standard_indonesian_phonemes(ipa_phonemes)
+        # Repeat calls for the same sentence are served from the cache
+        return _cached_text_phonemes(text, epi)
     except Exception as e:
         st.error(f"Error converting text to phonemes: {e}")
         return ""
@@ -164,11 +238,10 @@ def compare_phonemes(expected_phonemes, recognized_phonemes):
     max_len = max(len(expected_phonemes), len(recognized_phonemes))
     similarity = (1 - distance / max_len) * 100
 
-    # Generate detailed comparison
+    # Generate detailed comparison from the edit operations of the same alignment
     comparison = []
-    matcher = SequenceMatcher(None, expected_phonemes, recognized_phonemes)
 
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+    for tag, i1, i2, j1, j2 in Levenshtein.opcodes(expected_phonemes, recognized_phonemes):
         if tag == 'equal':
             comparison.append(("match", expected_phonemes[i1:i2], recognized_phonemes[j1:j2]))
         elif tag == 'replace':
@@ -3,7 +3,6 @@ Speech recognition functionality for the Indonesian Pronunciation App.
 """
 
 import streamlit as st
-import speech_recognition as sr
 
 def recognize_speech(audio_path, language='id', stt_model="whisper"):
     """
@@ -26,33 +25,37 @@ def recognize_speech(audio_path, language='id', stt_model="whisper"):
                 st.session_state.whisper_model = load_whisper_model(whisper_size)
 
             if st.session_state.whisper_model:
-                result = st.session_state.whisper_model.transcribe(
+                segments, _ = st.session_state.whisper_model.transcribe(
                     audio_path,
                     language=language,
-                    fp16=False  # Disable fp16 for better compatibility
+                    vad_filter=True
                 )
-                return result["text"].lower()
+                # Segments are a lazy generator; joining them runs the decode
+                return "".join(segment.text for segment in segments).strip().lower()
             else:
                 st.error("Whisper model is not loaded. Falling back to Google STT.")
                 # Fall back to Google's speech recognition service
                 return recognize_speech(audio_path, f"{language}-{language.upper()}", "google")
 
         elif stt_model == "google":
-            # Use Google's speech recognition service
+            # Use Google's speech recognition service (only this path needs speech_recognition)
+            import speech_recognition as sr
+
             recognizer = sr.Recognizer()
-            with sr.AudioFile(audio_path) as source:
-                audio_data = recognizer.record(source)
-                text = recognizer.recognize_google(audio_data, language=f"{language}-{language.upper()}")
-                return text.lower()
+            try:
+                with sr.AudioFile(audio_path) as source:
+                    audio_data = recognizer.record(source)
+                    text = recognizer.recognize_google(audio_data, language=f"{language}-{language.upper()}")
+                    return text.lower()
+            except sr.UnknownValueError:
+                return ""
+            except sr.RequestError as e:
+                st.error(f"Could not request results from speech recognition service: {e}")
+                return ""
         else:
             st.error(f"Unknown STT model: {stt_model}")
             return ""
 
-    except sr.UnknownValueError:
-        return ""
-    except sr.RequestError as e:
-        st.error(f"Could not request results from speech recognition service: {e}")
-        return ""
     except Exception as e:
         st.error(f"Error in speech recognition: {e}")
         return ""
@@ -4,31 +4,63 @@ Audio processing utilities for the Indonesian Pronunciation App.
 
 import streamlit as st
 import numpy as np
-import librosa
 import soundfile as sf
+import soxr
 import os
-import tempfile
-from scipy.spatial.distance import euclidean
-from fastdtw import fastdtw
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _load_audio_cached(audio_path, mtime_ns, size, sample_rate):
+    """Decode an audio file; mtime and size are part of the cache key only."""
+    y, sr = sf.read(audio_path, dtype='float32')
+    # Convert to mono if stereo
+    if y.ndim > 1:
+        y = y.mean(axis=1, dtype=np.float32)
+    if sr != sample_rate:
+        y = soxr.resample(y, sr, sample_rate)
+    return y
+
+def load_audio(audio_path, sample_rate=16000):
+    """
+    Load an audio file at the given sample rate, reusing earlier decodes of the same file.
+
+    Args:
+        audio_path: Path to the audio file
+        sample_rate: Sample rate to resample to
 
-def extract_features(audio_path, sample_rate=16000):
+    Returns:
+        Tuple: (samples, sample_rate)
+    """
+    # Key the cache on modification time and size so rewritten files are reloaded
+    stat = os.stat(audio_path)
+    return _load_audio_cached(audio_path, stat.st_mtime_ns, stat.st_size, sample_rate), sample_rate
+
+def extract_features(y, sr=16000):
     """
     Extract multiple types of audio features for more robust comparison.
 
     Args:
-        audio_path: Path to the audio file
-        sample_rate: Target sample rate
+        y: Audio samples
+        sr: Sample rate of the samples
 
     Returns:
         Dictionary of feature arrays
     """
-    y, sr = librosa.load(audio_path, sr=sample_rate)
+    # librosa is slow to import and only needed here, so importing this module
+    # for load_audio does not pull it in
+    import librosa
 
     # Extract multiple feature types
     features = {}
 
+    # Compute the magnitude spectrogram once and share it between the features
+    # (same STFT parameters as the librosa defaults they would use on their own)
+    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=512))
+
     # 1. MFCCs (13 coefficients)
-    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+    mel = librosa.feature.melspectrogram(S=S ** 2, sr=sr)
+    mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=13)
 
     # 2. Delta MFCCs (first order derivatives)
     mfcc_delta = librosa.feature.delta(mfccs)
@@ -37,13 +69,13 @@ def extract_features(audio_path, sample_rate=16000):
     mfcc_delta2 = librosa.feature.delta(mfccs, order=2)
 
     # 4. Spectral centroid - captures the "brightness" of the sound
-    centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
+    centroid = librosa.feature.spectral_centroid(S=S, sr=sr)
 
     # 5. Spectral bandwidth - captures the width of the spectrum
-    bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)
+    bandwidth = librosa.feature.spectral_bandwidth(S=S, sr=sr)
 
     # 6. Spectral rolloff - captures the frequency below which most energy is contained
-    rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
+    rolloff = librosa.feature.spectral_rolloff(S=S, sr=sr)
 
     # 7. Zero crossing rate - related to noisiness and consonant sounds
     zcr = librosa.feature.zero_crossing_rate(y)
@@ -59,9 +91,38 @@ def extract_features(audio_path, sample_rate=16000):
 
     return features
 
-def normalize_audio(audio_path, target_sr=16000, target_level=-25):
+def normalize_waveform(y, target_level=-25):
+    """
+    Scale audio samples to a target RMS level without clipping.
+
+    Args:
+        y: Audio samples
+        target_level: Target RMS level in dB
+
+    Returns:
+        Normalized audio samples
+    """
+    # Calculate the global RMS energy in dB in a single pass
+    rms = float(np.sqrt(np.dot(y, y) / max(len(y), 1)))
+    rms_db = 20 * np.log10(max(rms, 1e-10))
+
+    # Calculate the gain needed
+    gain_db = target_level - rms_db
+    gain_linear = 10 ** (gain_db / 20)
+
+    # Apply gain to normalize volume
+    y_normalized = y * gain_linear
+
+    # Ensure we don't clip the audio
+    peak = np.abs(y_normalized).max() if len(y_normalized) else 0.0
+    if peak > 1.0:
+        y_normalized = y_normalized / peak * 0.9  # Leave some headroom
+
+    return y_normalized
+
+def load_and_normalize(audio_path, target_sr=16000, target_level=-25):
     """
-    Normalize audio to a target level and ensure consistent sample rate.
+    Load audio once and normalize it in memory.
 
     Args:
         audio_path: Path to the audio file
@@ -69,36 +130,63 @@ def normalize_audio(audio_path, target_sr=16000, target_level=-25):
         target_level: Target RMS level in dB
 
     Returns:
-        Path to normalized audio file
+        Tuple: (normalized samples, sample rate, duration in seconds)
     """
+    # Load the audio file, reusing earlier decodes of the same file
+    y, sr = load_audio(audio_path, target_sr)
     try:
-        # Load the audio file with librosa
-        y, sr = librosa.load(audio_path, sr=target_sr)
+        y = normalize_waveform(y, target_level)
+    except Exception as e:
+        st.error(f"Error normalizing audio: {e}")
+        # Fall back to the original samples
+    return y, sr, len(y) / sr
 
-        # Calculate current RMS energy in dB
-        rms = librosa.feature.rms(y=y)[0]
-        rms_db = 20 * np.log10(np.mean(rms) + 1e-8)  # Add small constant to avoid log(0)
+@st.cache_data(show_spinner=False, max_entries=128)
+def _reference_features_cached(audio_path, mtime_ns, size, sample_rate):
+    """Normalize and extract features; mtime and size are part of the cache key only."""
+    y, sr, duration = load_and_normalize(audio_path, sample_rate)
+    return extract_features(y, sr), duration
 
-        # Calculate the gain needed
-        gain_db = target_level - rms_db
-        gain_linear = 10 ** (gain_db / 20)
+def load_reference_features(audio_path, sample_rate=16000):
+    """
+    Get the features of a reference recording, reusing earlier extractions of the same file.
 
-        # Apply gain to normalize volume
-        y_normalized = y * gain_linear
+    Args:
+        audio_path: Path to the audio file
+        sample_rate: Target sample rate
 
-        # Ensure we don't clip the audio
-        if np.max(np.abs(y_normalized)) > 1.0:
-            y_normalized = y_normalized / np.max(np.abs(y_normalized)) * 0.9  # Leave some headroom
+    Returns:
+        Tuple: (dictionary of feature arrays, duration in seconds)
+    """
+    # Key the cache on modification time and size so rewritten files are reprocessed
+    stat = os.stat(audio_path)
+    return _reference_features_cached(audio_path, stat.st_mtime_ns, stat.st_size, sample_rate)
 
-        # Create a temporary WAV file
-        temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        sf.write(temp_wav.name, y_normalized, target_sr)
-        temp_wav.close()
+def _user_features(audio_path, sample_rate=16000):
+    """
+    Normalize a user recording and extract its features.
 
-        return temp_wav.name
-    except Exception as e:
-        st.error(f"Error normalizing audio: {e}")
-        return audio_path  # Return original file as fallback
+    Args:
+        audio_path: Path to the audio file
+        sample_rate: Target sample rate
+
+    Returns:
+        Tuple: (dictionary of feature arrays, duration in seconds)
+    """
+    y, sr, duration = load_and_normalize(audio_path, sample_rate)
+    return extract_features(y, sr), duration
+
+# Weight of each feature type in the acoustic score
+# More balanced feature weights - reduce MFCC dominance
+feature_weights = {
+    'mfccs': 0.35,           # MFCCs are most important for pronunciation
+    'mfcc_delta': 0.15,      # Delta features capture transitions
+    'mfcc_delta2': 0.1,      # Delta-delta features capture acceleration
+    'spectral_centroid': 0.1,
+    'spectral_bandwidth': 0.1,
+    'spectral_rolloff': 0.1,
+    'zcr': 0.1
+}
 
 def compare_acoustic_features(reference_path, user_path, recognized_phonemes=None):
     """
@@ -119,30 +207,22 @@ def compare_acoustic_features(reference_path, user_path, recognized_phonemes=Non
         st.warning("No speech detected by phoneme recognition. Please speak clearly.")
         return 0
 
+    # numba is slow to import, so load the DTW kernel only when comparing
+    from app.utils.kernels import banded_dtw
+
     try:
-        # First normalize both audio files to ensure consistent volume levels
-        norm_reference_path = normalize_audio(reference_path)
-        norm_user_path = normalize_audio(user_path)
-
-        # Extract enhanced features from both audio files
-        reference_features = extract_features(norm_reference_path)
-        user_features = extract_features(norm_user_path)
-
-        # More balanced feature weights - reduce MFCC dominance
-        feature_weights = {
-            'mfccs': 0.35,           # MFCCs are most important for pronunciation
-            'mfcc_delta': 0.15,      # Delta features capture transitions
-            'mfcc_delta2': 0.1,      # Delta-delta features capture acceleration
-            'spectral_centroid': 0.1,
-            'spectral_bandwidth': 0.1,
-            'spectral_rolloff': 0.1,
-            'zcr': 0.1
-        }
+        # Load each file once and normalize it in memory to ensure consistent volume levels.
+        # The reference features are cached, so retries only process the user's recording;
+        # on a first attempt both recordings are processed side by side.
+        ctx = get_script_run_ctx()
+        with ThreadPoolExecutor(max_workers=2, initializer=add_script_run_ctx,
+                                initargs=(None, ctx)) as executor:
+            reference_future = executor.submit(load_reference_features, reference_path)
+            user_future = executor.submit(_user_features, user_path)
+            reference_features, ref_duration = reference_future.result()
+            user_features, user_duration = user_future.result()
 
         # Calculate length penalty with realistic strictness
-        ref_duration = librosa.get_duration(path=norm_reference_path)
-        user_duration = librosa.get_duration(path=norm_user_path)
-
         duration_ratio = min(ref_duration, user_duration) / max(ref_duration, user_duration)
 
         # Apply a more appropriate non-linear penalty (0.3 instead of 0.15)
@@ -168,12 +248,16 @@ def compare_acoustic_features(reference_path, user_path, recognized_phonemes=Non
             else:
                 # Use DTW for temporal alignment with balanced feature emphasis
                 if feature_name in ['mfccs', 'mfcc_delta', 'mfcc_delta2']:
-                    # For MFCC features, use DTW with full alignment
-                    distance, path = fastdtw(ref_feat[:min_length], user_feat[:min_length],
-                                           dist=euclidean)
+                    # For MFCC features, use DTW within a band around the diagonal
+                    band = max(10, int(0.1 * min_length))
+                    distance, path_length = banded_dtw(
+                        np.ascontiguousarray(ref_feat[:min_length]),
+                        np.ascontiguousarray(user_feat[:min_length]),
+                        band
+                    )
 
                     # Normalize by path length and feature dimensionality
-                    avg_dist = distance / (len(path) * ref_feat.shape[1])
+                    avg_dist = distance / (path_length * ref_feat.shape[1])
 
                     # Apply more balanced sigmoid-like scaling (2.0 instead of 1.8)
                     score = 100 / (1 + np.exp(avg_dist - 2.0))
@@ -217,13 +301,6 @@ def compare_acoustic_features(reference_path, user_path, recognized_phonemes=Non
         # Ensure the score is in the range [0, 100]
         final_score = max(0, min(100, final_score))
 
-        # Clean up temporary files
-        try:
-            os.unlink(norm_reference_path)
-            os.unlink(norm_user_path)
-        except:
-            pass
-
         return final_score
 
     except Exception as e:
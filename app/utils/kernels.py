@@ -0,0 +1,68 @@
+"""
+Numba-compiled numeric kernels for the Indonesian Pronunciation App.
+
+Importing numba is slow, so import this module inside the functions that use it.
+"""
+
+import numpy as np
+from numba import njit, prange
+
+@njit(parallel=True, fastmath=True, cache=True)
+def abs_stats(y):
+    """Compute the maximum and summed absolute amplitude in one parallel pass."""
+    max_abs = 0.0
+    sum_abs = 0.0
+    for i in prange(y.shape[0]):
+        a = abs(y[i])
+        sum_abs += a
+        max_abs = max(max_abs, a)
+    return max_abs, sum_abs
+
+# Fast-math flags without nnan/ninf: cells outside the band hold np.inf and are compared
+_DTW_FASTMATH = {'reassoc', 'contract', 'arcp'}
+
+@njit(fastmath=_DTW_FASTMATH, cache=True)
+def banded_dtw(a, b, band):
+    """
+    Dynamic time warping of two feature sequences within a Sakoe-Chiba band.
+
+    Frames are compared with the Euclidean distance and only two rows of the
+    cost matrix are kept. Returns the total cost of the best path and its length.
+    """
+    n = a.shape[0]
+    m = b.shape[0]
+    prev_cost = np.full(m + 1, np.inf)
+    cur_cost = np.full(m + 1, np.inf)
+    prev_len = np.zeros(m + 1, np.int64)
+    cur_len = np.zeros(m + 1, np.int64)
+    prev_cost[0] = 0.0
+
+    for i in range(1, n + 1):
+        cur_cost[:] = np.inf
+        # Center the band on the diagonal, scaled for sequences of different lengths
+        center = (i * m) // n
+        lo = max(1, center - band)
+        hi = min(m, center + band)
+        for j in range(lo, hi + 1):
+            d = 0.0
+            for k in range(a.shape[1]):
+                diff = a[i - 1, k] - b[j - 1, k]
+                d += diff * diff
+            d = np.sqrt(d)
+
+            # Best of the diagonal, vertical and horizontal predecessors
+            best = prev_cost[j - 1]
+            best_len = prev_len[j - 1]
+            if prev_cost[j] < best:
+                best = prev_cost[j]
+                best_len = prev_len[j]
+            if cur_cost[j - 1] < best:
+                best = cur_cost[j - 1]
+                best_len = cur_len[j - 1]
+            cur_cost[j] = best + d
+            cur_len[j] = best_len + 1
+
+        prev_cost, cur_cost = cur_cost, prev_cost
+        prev_len, cur_len = cur_len, prev_len
+
+    return prev_cost[m], prev_len[m]
@@ -4,6 +4,40 @@ Session state management for the Indonesian Pronunciation App.
 
 import streamlit as st
 
+# Default values for session state variables, set on a session's first run.
+# Mutable defaults are created per session in initialize_session_state.
+session_defaults = {
+    'current_sentence': "",
+    'current_translation': "",
+    'current_phonemes': "",
+    'audio_path': None,
+    'user_recording': None,
+    'score': None,
+    'phoneme_score': None,
+    'acoustic_score': None,
+    'content_score': None,
+    'recognized_text': None,
+    'recognized_phonemes': None,
+    'common_voice_data': None,
+    'total_attempts': 0,
+    'successful_attempts': 0,
+    'last_recorded_score': None,
+    'phoneme_comparison': None,
+    'model_type': "cahya-indonesian",
+    'stt_model': "whisper",
+    'is_using_tts': False,
+    'sentences_df': None,
+    'original_sentences_df': None,
+    'difficulty_partitions': None,
+    'original_filename': None,
+    'whisper_model': None,
+    'gcs_client': None,
+    'text_phonemes': None,
+    'current_difficulty': "medium",
+    'recording_duration': 3,
+    'input_device_id': None
+}
+
 def initialize_session_state(gcs_bucket_name, gcs_tsv_path):
     """
     Initialize all session state variables.
@@ -12,73 +46,32 @@ def initialize_session_state(gcs_bucket_name, gcs_tsv_path):
         gcs_bucket_name: Name of the GCS bucket
         gcs_tsv_path: Path to the TSV file in the bucket
     """
-    # Initialize session states
-    if 'current_sentence' not in st.session_state:
-        st.session_state.current_sentence = ""
-    if 'current_translation' not in st.session_state:
-        st.session_state.current_translation = ""
-    if 'current_phonemes' not in st.session_state:
-        st.session_state.current_phonemes = ""
-    if 'audio_path' not in st.session_state:
-        st.session_state.audio_path = None
-    if 'user_recording' not in st.session_state:
-        st.session_state.user_recording = None
-    if 'score' not in st.session_state:
-        st.session_state.score = None
-    if 'phoneme_score' not in st.session_state:
-        st.session_state.phoneme_score = None
-    if 'acoustic_score' not in st.session_state:
-        st.session_state.acoustic_score = None
-    if 'content_score' not in st.session_state:
-        st.session_state.content_score = None
-    if 'recognized_text' not in st.session_state:
-        st.session_state.recognized_text = None
-    if 'recognized_phonemes' not in st.session_state:
-        st.session_state.recognized_phonemes = None
-    if 'common_voice_data' not in st.session_state:
-        st.session_state.common_voice_data = None
-    if 'total_attempts' not in st.session_state:
-        st.session_state.total_attempts = 0
-    if 'successful_attempts' not in st.session_state:
-        st.session_state.successful_attempts = 0
-    if 'difficulty_attempts' not in st.session_state:
-        st.session_state.difficulty_attempts = {"easy": 0, "medium": 0, "difficult": 0}
-    if 'difficulty_success' not in st.session_state:
-        st.session_state.difficulty_success = {"easy": 0, "medium": 0, "difficult": 0}
-    if 'last_recorded_score' not in st.session_state:
-        st.session_state.last_recorded_score = None
-    if 'phoneme_comparison' not in st.session_state:
-        st.session_state.phoneme_comparison = None
-    if 'model_type' not in st.session_state:
-        st.session_state.model_type = "cahya-indonesian"
-    if 'stt_model' not in st.session_state:
-        st.session_state.stt_model = "whisper"
-    if 'is_using_tts' not in st.session_state:
-        st.session_state.is_using_tts = False
-    if 'sentences_df' not in st.session_state:
-        st.session_state.sentences_df = None
-    if 'original_sentences_df' not in st.session_state:
-        st.session_state.original_sentences_df = None
-    if 'filtered_sentences_df' not in st.session_state:
-        st.session_state.filtered_sentences_df = None
-    if 'original_filename' not in st.session_state:
-        st.session_state.original_filename = None
-    if 'whisper_model' not in st.session_state:
-        st.session_state.whisper_model = None
-    if 'gcs_client' not in st.session_state:
-        st.session_state.gcs_client = None
-    if 'gcs_bucket_name' not in st.session_state:
-        st.session_state.gcs_bucket_name = gcs_bucket_name
-    if 'gcs_tsv_path' not in st.session_state:
-        st.session_state.gcs_tsv_path = gcs_tsv_path
-    if 'text_phonemes' not in st.session_state:
-        st.session_state.text_phonemes = None
-    if 'current_difficulty' not in st.session_state:
-        st.session_state.current_difficulty = "medium"
-    if 'recording_duration' not in st.session_state:
-        st.session_state.recording_duration = 3
-    if 'input_device_id' not in st.session_state:
-        st.session_state.input_device_id = None
+    # Variables set on an earlier run keep their values
+    for key, value in session_defaults.items():
+        st.session_state.setdefault(key, value)
+
+    # Per-session counters need their own dictionaries
+    st.session_state.setdefault('difficulty_attempts', {"easy": 0, "medium": 0, "difficult": 0})
+    st.session_state.setdefault('difficulty_success', {"easy": 0, "medium": 0, "difficult": 0})
+
+    st.session_state.setdefault('gcs_bucket_name', gcs_bucket_name)
+    st.session_state.setdefault('gcs_tsv_path', gcs_tsv_path)
+
+def get_filtered_sentences():
+    """
+    Get the loaded sentences for the current difficulty.
+
+    The rows come from the partitions made when the DataFrame was loaded,
+    so no filtered copy needs to be kept in the session.
+
+    Returns:
+        DataFrame with the sentences of the current difficulty, or None if
+        no DataFrame is loaded
+    """
+    partitions = st.session_state.get('difficulty_partitions')
+    if partitions is None:
+        return st.session_state.get('original_sentences_df')
+    return partitions.get(st.session_state.current_difficulty)
 
 def reset_session_scores():
     """
@@ -2,9 +2,11 @@
 Text processing utilities for the Indonesian Pronunciation App.
 """
 
-import re
 import string
-from difflib import SequenceMatcher
+from rapidfuzz import fuzz, process
+
+# Translation table deleting ASCII punctuation in a single C-level pass
+_PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
 
 def normalize_text(text):
     """
@@ -16,17 +18,12 @@ def normalize_text(text):
     Returns:
         Normalized text
     """
-    # Convert to lowercase
-    text = text.lower()
-    # Remove punctuation
-    text = re.sub(f'[{string.punctuation}]', '', text)
-    # Remove extra whitespace
-    text = ' '.join(text.split())
-    return text
+    # Lowercase, remove punctuation, then collapse extra whitespace
+    return ' '.join(text.lower().translate(_PUNCTUATION_TABLE).split())
 
 def compare_text_content(expected_text, recognized_text):
     """
-    Compare the recognized text with the expected sentence using sequence matching.
+    Compare the recognized text with the expected sentence using edit-distance similarity.
     This ensures consistency between the content score and feedback.
 
     Args:
@@ -47,30 +44,19 @@ def compare_text_content(expected_text, recognized_text):
     if normalized_expected == normalized_recognized:
         return 100
 
-    # Calculate similarity using SequenceMatcher
-    sequence_similarity = SequenceMatcher(None, normalized_expected, normalized_recognized).ratio() * 100
+    # Calculate similarity of the whole sentences
+    sequence_similarity = fuzz.ratio(normalized_expected, normalized_recognized)
 
     # Calculate word-level similarity for a more balanced score
     expected_words = normalized_expected.split()
     recognized_words = normalized_recognized.split()
 
+    # Score every expected word against every recognized word in one call and
+    # count the expected words with a close match (similarity > 80%)
     word_matches = 0
-    for ew in expected_words:
-        min_distance = float('inf')
-        best_match = None
-
-        for rw in recognized_words:
-            # Use sequence matcher for word comparison
-            ratio = SequenceMatcher(None, ew, rw).ratio()
-            distance = 1 - ratio  # Convert similarity to distance
-
-            if distance < min_distance:
-                min_distance = distance
-                best_match = rw
-
-        # If there's a close match (similarity > 80%)
-        if best_match and min_distance < 0.2:  # 80% similarity threshold
-            word_matches += 1
+    if expected_words and recognized_words:
+        similarity = process.cdist(expected_words, recognized_words, scorer=fuzz.ratio, score_cutoff=80)
+        word_matches = int((similarity.max(axis=1) > 80).sum())
 
     word_score = (word_matches / len(expected_words)) * 100 if expected_words else 0
 
@@ -3,12 +3,41 @@ Translation utilities for the Indonesian Pronunciation App.
 """
 
 import streamlit as st
-from app.ml_logic.models import load_translation_model
+from functools import lru_cache
+
+@lru_cache(maxsize=4096)
+def _cached_translation(text, max_length):
+    """
+    Translate text with MarianMT, memoized across sessions.
+
+    Raises on failure so errors are not cached.
+
+    Args:
+        text: Text to translate
+        max_length: Maximum length of text chunk for processing
+
+    Returns:
+        Translated text
+    """
+    from app.ml_logic.models import load_translation_model
+    model, tokenizer = load_translation_model()
+
+    # Split long text into chunks of max_length words to avoid issues
+    words = text.split()
+    parts = [" ".join(words[i:i+max_length]) for i in range(0, len(words), max_length)] or [text]
+
+    # Translate all chunks in one batched generate call
+    inputs = tokenizer(parts, return_tensors="pt", padding=True, truncation=True)
+    outputs = model.generate(**inputs)
+    return " ".join(tokenizer.batch_decode(outputs, skip_special_tokens=True))
 
 def translate_text(text, max_length=50):
     """
     Translate Indonesian text to English using MarianMT.
 
+    Sentences are shared by all users, so translations are cached per
+    process and repeat requests skip the model.
+
     Args:
         text: Text to translate
         max_length: Maximum length of text chunk for processing
@@ -16,27 +45,14 @@ def translate_text(text, max_length=50):
     Returns:
         Translated text
     """
+    # Imported here so importing this module does not pull in torch and transformers
+    from app.ml_logic.models import load_translation_model
     model, tokenizer = load_translation_model()
     if model is None or tokenizer is None:
         return "Translation not available"
 
     try:
-        # Split long text to avoid issues
-        if len(text.split()) > max_length:
-            parts = []
-            words = text.split()
-            for i in range(0, len(words), max_length):
-                part = " ".join(words[i:i+max_length])
-                inputs = tokenizer([part], return_tensors="pt", padding=True)
-                outputs = model.generate(**inputs)
-                translation = tokenizer.decode(outputs[0], skip_special_tokens=True)
-                parts.append(translation)
-            return " ".join(parts)
-        else:
-            inputs = tokenizer([text], return_tensors="pt", padding=True)
-            outputs = model.generate(**inputs)
-            translation = tokenizer.decode(outputs[0], skip_special_tokens=True)
-            return translation
+        return _cached_translation(text, max_length)
     except Exception as e:
         st.warning(f"Error in translation: {e}")
         return "Translation error"